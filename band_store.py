@@ -0,0 +1,84 @@
+import hashlib
+import math
+import os
+import threading
+
+import numpy as np
+
+# Native Sentinel-2 resolution of the visible and NIR bands
+BAND_SCALE_METERS = 10
+SPECTRAL_BANDS = ('B2', 'B3', 'B4', 'B8', 'B11', 'B12')
+# Layout of the last axis of every band capture; all values are int16
+BAND_ORDER = SPECTRAL_BANDS + ('NDVI', 'CLEAR')
+NDVI_SCALE = 10000
+# Scene classification classes treated as cloud: shadow, medium/high cloud, cirrus
+CLOUD_SCL_CLASSES = (3, 8, 9, 10)
+# Same stretch as capture.VIS_PARAMS, so the model sees band captures as it sees PNGs
+RGB_VIS_PARAMS = {'bands': ['B4', 'B3', 'B2'], 'min': 0, 'max': 3000, 'gamma': 1.4}
+
+METERS_PER_DEGREE = 111320
+
+
+def band_index(name):
+    """Position of a band in the last axis of a band capture."""
+    return BAND_ORDER.index(name)
+
+
+def pixel_grid(region_coords, scale=BAND_SCALE_METERS):
+    """
+    Return (width, height) of a region [west, south, east, north] sampled at
+    scale metres per pixel, with longitude spacing corrected for latitude.
+    """
+    west, south, east, north = region_coords
+    mid_lat = math.radians((south + north) / 2)
+    width = max(round((east - west) * METERS_PER_DEGREE * math.cos(mid_lat) / scale), 1)
+    height = max(round((north - south) * METERS_PER_DEGREE / scale), 1)
+    return width, height
+
+
+def save_bands(array, dest):
+    """Write an HxWxC int16 band array as .npy, atomically; returns the file's SHA-256."""
+    os.makedirs(os.path.dirname(dest) or '.', exist_ok=True)
+    tmp_path = f"{dest}.{os.getpid()}.{threading.get_ident()}.tmp.npy"
+    digest = hashlib.sha256()
+    with open(tmp_path, 'wb') as f:
+        np.save(f, np.ascontiguousarray(array, dtype=np.int16))
+    with open(tmp_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    os.replace(tmp_path, dest)
+    return digest.hexdigest()
+
+
+def load_bands(path):
+    """Memory-map a band capture; pages are read from disk only when sliced."""
+    return np.load(path, mmap_mode='r')
+
+
+def ndvi(bands):
+    """NDVI in [-1, 1] as float32."""
+    return bands[..., band_index('NDVI')].astype(np.float32) / NDVI_SCALE
+
+
+def clear_mask(bands):
+    """Boolean mask of pixels not flagged as cloud or cloud shadow."""
+    return bands[..., band_index('CLEAR')] > 0
+
+
+def read_rgb(bands, x, y, width, height, vis_params=RGB_VIS_PARAMS):
+    """
+    Read a pixel window of a band capture as HxWx3 float32 RGB in [0, 1],
+    stretched like the rendered thumbnails. Only the window's rows are paged
+    in from a memory-mapped capture; areas outside it are zero-filled.
+    """
+    rows, cols = bands.shape[:2]
+    patch = np.zeros((height, width, 3), dtype=np.float32)
+    y0, y1 = max(y, 0), min(y + height, rows)
+    x0, x1 = max(x, 0), min(x + width, cols)
+    if y0 >= y1 or x0 >= x1:
+        return patch
+    channels = [band_index(name) for name in vis_params['bands']]
+    window = bands[y0:y1, x0:x1][..., channels].astype(np.float32)
+    stretched = np.clip((window - vis_params['min']) / (vis_params['max'] - vis_params['min']), 0, 1)
+    patch[y0 - y:y1 - y, x0 - x:x1 - x] = stretched ** (1 / vis_params.get('gamma', 1))
+    return patch
@@ -0,0 +1,58 @@
+import itertools
+
+from capture import get_satellite_image
+from capture_engine import capture_many
+from imagery_backend import FakeBackend
+
+from conftest import FAKE_LATENCY, SAMPLE_DIR
+
+_points = itertools.count()
+
+
+def _fresh_point():
+    # A new region every call, so each capture misses the image cache
+    i = next(_points)
+    return 10 + (i % 500) * 0.1, 20 + (i // 500) * 0.1
+
+
+def test_capture_cold(benchmark, fake_backend):
+    def capture():
+        filename, error, _ = get_satellite_image(*_fresh_point())
+        assert error is None and filename
+
+    benchmark.pedantic(capture, rounds=20)
+
+
+def test_capture_cache_hit(benchmark, fake_backend):
+    filename, error, _ = get_satellite_image(31.2938, 75.5943)
+    assert error is None
+    fetches = fake_backend.calls['fetch']
+
+    result = benchmark(get_satellite_image, 31.2938, 75.5943)
+    assert result[0] and fake_backend.calls['fetch'] == fetches
+
+
+def test_capture_throughput_concurrent(benchmark, fake_backend):
+    def batch():
+        targets = [_fresh_point() for _ in range(32)]
+        results = capture_many(targets, get_satellite_image, max_workers=8)
+        assert all(r['filename'] for r in results)
+
+    benchmark.pedantic(batch, rounds=3)
+    # 32 captures of two upstream calls each, spread over 8 workers
+    benchmark.extra_info['serial_seconds'] = 32 * 2 * FAKE_LATENCY
+
+
+def test_capture_with_quota_retries(benchmark, workspace):
+    from imagery_backend import set_imagery_backend
+
+    set_imagery_backend(FakeBackend(SAMPLE_DIR, latency=FAKE_LATENCY, quota_error_rate=0.2, seed=1))
+    try:
+        def batch():
+            targets = [_fresh_point() for _ in range(16)]
+            return capture_many(targets, get_satellite_image, max_workers=8, backoff=0.01)
+
+        results = benchmark.pedantic(batch, rounds=3)
+        benchmark.extra_info['failed'] = sum(1 for r in results if r['error'])
+    finally:
+        set_imagery_backend(None)
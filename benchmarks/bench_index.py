@@ -0,0 +1,38 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+import capture_index
+
+ARCHIVE_SIZE = 20000
+
+
+@pytest.fixture
+def populated_index(workspace):
+    rng = random.Random(0)
+    start = datetime(2024, 1, 1)
+    with capture_index._conn_lock:
+        conn = capture_index._get_conn()
+        with conn:
+            for i in range(ARCHIVE_SIZE):
+                lat, lon = rng.uniform(8, 37), rng.uniform(68, 97)
+                captured_at = start + timedelta(minutes=rng.randrange(60 * 24 * 300))
+                capture_index._insert(conn, f"sat_{i}.png", lat, lon, captured_at.timestamp(), None, None)
+    return capture_index
+
+
+def test_index_nearest(benchmark, populated_index):
+    rows = benchmark(populated_index.nearest, 30.0, 79.0, 10)
+    assert len(rows) == 10
+
+
+def test_index_bbox_date_range(benchmark, populated_index):
+    benchmark(populated_index.query_bbox, 29.0, 77.0, 31.5, 80.0,
+              datetime(2024, 3, 1), datetime(2024, 6, 1))
+
+
+def test_index_backfill(benchmark, fake_backend):
+    from conftest import SAMPLE_DIR
+
+    benchmark(capture_index.backfill, SAMPLE_DIR)
@@ -0,0 +1,30 @@
+import glob
+import os
+
+import pytest
+
+from conftest import SAMPLE_DIR
+
+pytest.importorskip('tensorflow')
+
+import landslide_model  # noqa: E402
+
+SAMPLE = sorted(glob.glob(os.path.join(SAMPLE_DIR, 'sat_*.png')))[0]
+
+
+@pytest.fixture(scope='module')
+def warm_model():
+    landslide_model.warm_up()
+
+
+def test_inference_single_patch(benchmark, warm_model):
+    import numpy as np
+
+    height, width, channels = landslide_model.model_input_shape()
+    batch = np.zeros((1, height, width, channels), dtype=np.float32)
+    benchmark(landslide_model.predict_patches, batch)
+
+
+def test_inference_full_capture_tiled(benchmark, warm_model):
+    result = benchmark.pedantic(landslide_model.predict_landslide, args=(SAMPLE,), rounds=3)
+    benchmark.extra_info['risk_score'] = result['risk_score']
@@ -0,0 +1,33 @@
+"""
+Shared fixtures for the benchmark suite. Every benchmark runs against the
+offline FakeBackend in a scratch directory, so no Earth Engine credentials
+or network access are needed:
+
+    pytest benchmarks/
+    pytest benchmarks/ --benchmark-autosave          # store a baseline
+    pytest benchmarks/ --benchmark-compare --benchmark-compare-fail=median:20%
+
+GEOSHIELD_BENCH_LATENCY sets the fake upstream latency in seconds (default 0.05).
+"""
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from imagery_backend import FakeBackend, set_imagery_backend  # noqa: E402
+# One workspace fixture for both suites; importing it here registers it
+from tests.conftest import SAMPLE_DIR, workspace  # noqa: E402,F401
+
+FAKE_LATENCY = float(os.environ.get('GEOSHIELD_BENCH_LATENCY', 0.05))
+
+
+@pytest.fixture
+def fake_backend(workspace):
+    """Install a FakeBackend serving the repository's sample captures."""
+    backend = FakeBackend(SAMPLE_DIR, latency=FAKE_LATENCY, seed=0)
+    set_imagery_backend(backend)
+    yield backend
+    set_imagery_backend(None)
@@ -0,0 +1,67 @@
+"""
+Startup benchmark: measures how long a fresh interpreter takes to import the
+dashboard and fails if it exceeds the budget or eagerly loads heavy modules.
+
+    python benchmarks/startup_benchmark.py [--budget SECONDS] [--runs N]
+
+Run from the repository root. Each run uses a new process so nothing is
+already in sys.modules; the median of the runs is compared to the budget.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_BUDGET_SECONDS = 1.5
+# Modules that must only be imported on first use, never at startup
+DEFERRED_MODULES = ('ee', 'geemap', 'folium', 'requests', 'tensorflow', 'onnxruntime', 'PIL')
+
+MEASURE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    'seconds': elapsed,
+    'loaded': sorted(m for m in {deferred!r} if m in sys.modules),
+}}))
+"""
+
+
+def measure(module):
+    """Import module in a fresh interpreter and return its timing report."""
+    code = MEASURE.format(module=module, deferred=DEFERRED_MODULES)
+    output = subprocess.run(
+        [sys.executable, '-c', code], cwd=REPO_ROOT,
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--module', default='dashboard')
+    parser.add_argument('--budget', type=float, default=IMPORT_BUDGET_SECONDS)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    reports = [measure(args.module) for _ in range(args.runs)]
+    median = statistics.median(r['seconds'] for r in reports)
+    loaded = sorted({m for r in reports for m in r['loaded']})
+    print(f"import {args.module}: median {median:.3f}s over {args.runs} runs (budget {args.budget:.3f}s)")
+
+    failed = False
+    if median > args.budget:
+        print(f"FAIL: startup exceeds budget by {median - args.budget:.3f}s")
+        failed = True
+    if loaded:
+        print(f"FAIL: heavy modules imported at startup: {', '.join(loaded)}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,162 @@
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+
+# Every stored file lives once under OBJECT_DIR, named by the SHA-256 of its
+# bytes; capture filenames (sat_*.png), cache entries and other names are
+# hard links to it, so identical captures share one copy on disk.
+OBJECT_DIR = os.path.join("satellite_images", "objects")
+HASH_CHUNK_BYTES = 1024 * 1024
+
+_lock = threading.Lock()
+
+
+def _alias_db():
+    # Objects re-encoded by compaction keep an alias from the hash of their
+    # original bytes, which stays the file's content identity
+    return os.path.join(OBJECT_DIR, "aliases.sqlite")
+
+
+def _connect():
+    os.makedirs(OBJECT_DIR, exist_ok=True)
+    conn = sqlite3.connect(_alias_db(), timeout=30)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS aliases (
+            sha256 TEXT PRIMARY KEY,
+            object_sha256 TEXT NOT NULL,
+            object TEXT NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS aliases_object ON aliases (object_sha256)")
+    return conn
+
+
+def _query(sql, args=(), many=False):
+    conn = _connect()
+    try:
+        rows = (conn.executemany if many else conn.execute)(sql, args).fetchall()
+        conn.commit()
+        return rows
+    finally:
+        conn.close()
+
+
+def file_sha256(path):
+    """Hash a file's contents in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def object_path(sha256, extension):
+    """Where the object with this hash is stored; sharded so no directory grows huge."""
+    return os.path.join(OBJECT_DIR, sha256[:2], f"{sha256}{extension}")
+
+
+def is_object(path):
+    """Whether path is inside the object store."""
+    return os.path.abspath(path).startswith(os.path.abspath(OBJECT_DIR) + os.sep)
+
+
+def add_alias(sha256, obj, object_sha256):
+    """
+    Record that content originally hashing to sha256 is now stored, re-encoded,
+    as obj (whose own bytes hash to object_sha256).
+    """
+    with _lock:
+        _query("INSERT OR REPLACE INTO aliases (sha256, object_sha256, object) VALUES (?, ?, ?)",
+               (sha256, object_sha256, obj))
+
+
+def _alias_object(sha256):
+    rows = _query("SELECT object FROM aliases WHERE sha256 = ?", (sha256,))
+    return rows[0][0] if rows and os.path.exists(rows[0][0]) else None
+
+
+def content_sha256(path):
+    """
+    Hash identifying a file's content across re-encoding: the hash of its
+    original bytes if compaction re-encoded it, otherwise of its bytes.
+    """
+    sha256 = file_sha256(path)
+    if not os.path.exists(_alias_db()):
+        return sha256
+    rows = _query("SELECT sha256 FROM aliases WHERE object_sha256 = ? ORDER BY sha256 LIMIT 1", (sha256,))
+    return rows[0][0] if rows else sha256
+
+
+def link_or_copy(src, dest):
+    """Point dest at src's contents: a hard link where possible, replacing dest atomically."""
+    os.makedirs(os.path.dirname(dest) or '.', exist_ok=True)
+    tmp_path = f"{dest}.{os.getpid()}.{threading.get_ident()}.link"
+    try:
+        os.link(src, tmp_path)
+    except OSError:
+        shutil.copyfile(src, tmp_path)
+    os.replace(tmp_path, dest)
+
+
+def store(path, sha256=None, extension=None):
+    """
+    Content-address the file at path and return its object path. If an object
+    with the same bytes already exists, path is relinked to it and its own
+    copy freed; otherwise the file itself becomes the object. sha256 skips
+    rehashing when the caller computed it while writing the file. Bytes
+    that compaction re-encoded are matched through their alias. On
+    filesystems without hard links the file is left as it is and path is
+    returned, since a separate object would only double its size.
+    """
+    sha256 = sha256 or file_sha256(path)
+    obj = object_path(sha256, extension if extension is not None else os.path.splitext(path)[1])
+    with _lock:
+        if not os.path.exists(obj) and os.path.exists(_alias_db()):
+            obj = _alias_object(sha256) or obj
+        if os.path.exists(obj):
+            if not os.path.samefile(obj, path):
+                link_or_copy(obj, path)
+            return obj
+        os.makedirs(os.path.dirname(obj), exist_ok=True)
+        try:
+            os.link(path, obj)
+        except OSError:
+            return path
+    return obj
+
+
+def iter_objects():
+    """Yield (path, stat) for every object."""
+    if not os.path.isdir(OBJECT_DIR):
+        return
+    for shard in os.scandir(OBJECT_DIR):
+        if shard.is_dir():
+            for entry in os.scandir(shard.path):
+                if entry.is_file() and not entry.name.endswith('.link'):
+                    yield entry.path, entry.stat()
+
+
+def collect_garbage():
+    """Delete objects no other name links to any more. Returns (objects, bytes) freed."""
+    removed = []
+    freed = 0
+    with _lock:
+        for path, stat in list(iter_objects()):
+            if stat.st_nlink == 1:
+                os.remove(path)
+                removed.append(path)
+                freed += stat.st_size
+        if removed and os.path.exists(_alias_db()):
+            _query("DELETE FROM aliases WHERE object = ?", [(path,) for path in removed], many=True)
+    return len(removed), freed
+
+
+def usage():
+    """Return (object count, total bytes) of the object store."""
+    count = total = 0
+    for _, stat in iter_objects():
+        count += 1
+        total += stat.st_size
+    return count, total
@@ -0,0 +1,166 @@
+import json
+import logging
+import os
+from datetime import datetime
+
+import blob_store
+import capture_index
+import image_cache
+import metrics
+from band_store import BAND_ORDER, BAND_SCALE_METERS, CLOUD_SCL_CLASSES, NDVI_SCALE
+from capture_engine import is_quota_error
+from grid_scan import region_bounds
+from http_client import HTTP_TIMEOUT, get_http_session
+from imagery_backend import get_imagery_backend
+from raster_store import ensure_cog
+from singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+CAPTURE_DIR = "satellite_images"
+BAND_CAPTURE_DIR = os.path.join("satellite_images", "bands")
+
+VIS_PARAMS = {
+    'min': 0,
+    'max': 3000,
+    'bands': ['B4', 'B3', 'B2'],
+    'gamma': 1.4
+}
+THUMB_DIMENSIONS = '2048'
+# Identifies the server-side band computation in cache keys for band captures
+BAND_PARAMS = {
+    'bands': list(BAND_ORDER),
+    'cloud_classes': list(CLOUD_SCL_CLASSES),
+    'ndvi_scale': NDVI_SCALE,
+}
+
+# Sentinel-2 revisits every ~5 days, so grid scans reuse captures younger than that
+SCAN_REUSE_SECONDS = 5 * 24 * 3600
+
+_in_flight = SingleFlight()
+
+
+def resolve_latest_scene(region_coords, since=None):
+    """
+    Resolve the most recent clear scene over [west, south, east, north] with
+    the active imagery backend, optionally only among scenes acquired after
+    since (milliseconds since the epoch). Returns a dict with scene_id, date,
+    time and cloud_percentage, or None if there is none.
+    """
+    return get_imagery_backend().resolve_latest_scene(region_coords, since)
+
+
+def get_satellite_image(lat, lon, size_km=5, scene=None):
+    """
+    Fetch a satellite image of a specified region from the imagery backend
+    (Google Earth Engine unless replaced with set_imagery_backend).
+    Concurrent requests for the same region (rounded to the 4 decimals used in
+    capture filenames) share a single upstream fetch and all get its result.
+    Pass a scene already returned by resolve_latest_scene(s) to skip resolving
+    it again.
+    """
+    region_coords = region_bounds(lat, lon, size_km)
+    key = (tuple(round(c, 4) for c in region_coords), THUMB_DIMENSIONS, json.dumps(VIS_PARAMS, sort_keys=True))
+    return _in_flight.do(key, _fetch_satellite_image, lat, lon, size_km, scene)
+
+
+def get_band_capture(lat, lon, size_km=5, scale=BAND_SCALE_METERS, scene=None):
+    """
+    Fetch the raw Sentinel-2 bands of a region at scale metres per pixel as an
+    int16 .npy file laid out as band_store.BAND_ORDER (spectral bands, NDVI and
+    a clear-sky mask). Returns (path, error, image_date) like
+    get_satellite_image; load the file with band_store.load_bands to
+    memory-map it, or pass the path straight to predict_landslide.
+    """
+    region_coords = region_bounds(lat, lon, size_km)
+    key = (tuple(round(c, 4) for c in region_coords), f"{scale}m", json.dumps(BAND_PARAMS, sort_keys=True))
+    return _in_flight.do(key, _fetch_satellite_image, lat, lon, size_km, scene, scale)
+
+
+def _fetch_satellite_image(lat, lon, size_km, scene=None, scale=None):
+    with metrics.request('capture', lat=lat, lon=lon, size_km=size_km):
+        try:
+            return _capture(lat, lon, size_km, scene, scale)
+        except Exception as e:
+            metrics.inc('geoshield_capture_errors_total', cause='quota' if is_quota_error(str(e)) else 'error')
+            return None, str(e), None
+
+
+def _capture(lat, lon, size_km, scene=None, scale=None):
+    # scale selects a raw band capture instead of a rendered thumbnail
+    if scale is None:
+        dimensions, params, directory, extension = THUMB_DIMENSIONS, VIS_PARAMS, CAPTURE_DIR, 'png'
+    else:
+        dimensions, params, directory, extension = f"{scale}m", BAND_PARAMS, BAND_CAPTURE_DIR, 'npy'
+    backend = get_imagery_backend()
+    region_coords = region_bounds(lat, lon, size_km)
+    if scene is None:
+        with metrics.span('resolve_scene'):
+            scene = backend.resolve_latest_scene(region_coords)
+    if scene is None:
+        metrics.inc('geoshield_capture_errors_total', cause='no_scene')
+        return None, "No clear images available for this location", None
+    scene_id = scene['scene_id']
+
+    # Serve repeat captures of an unchanged scene straight from disk
+    key = image_cache.cache_key(scene_id, region_coords, dimensions, params)
+    with metrics.span('cache_lookup'):
+        cached_path, _ = image_cache.lookup(key)
+    metrics.inc('geoshield_image_cache_total', result='hit' if cached_path else 'miss')
+    if cached_path:
+        if scale is None:
+            _write_cog(cached_path, region_coords)
+        return cached_path, None, scene['date']
+
+    os.makedirs(directory, exist_ok=True)
+    captured_at = datetime.now()
+    filename = f"{directory}/sat_{lat:.4f}_{lon:.4f}_{captured_at:%Y%m%d_%H%M%S}.{extension}"
+
+    if scale is None:
+        with metrics.span('fetch_thumbnail'):
+            digest = backend.fetch_thumbnail(scene, region_coords, THUMB_DIMENSIONS, VIS_PARAMS, filename)
+    else:
+        with metrics.span('fetch_bands'):
+            digest = backend.fetch_bands(scene, region_coords, scale, filename)
+
+    with metrics.span('record_capture'):
+        # Identical bytes from an earlier capture are shared rather than stored twice
+        blob_store.store(filename, digest)
+        region = image_cache.region_key(region_coords, dimensions, params)
+        image_cache.store(key, scene_id, filename, scene['date'], region=region, sha256=digest)
+        # The archive index covers the PNG captures the dashboard shows
+        if scale is None:
+            capture_index.add_capture(filename, lat, lon, captured_at, scene_id, scene['date'])
+    if scale is None:
+        _write_cog(filename, region_coords, digest)
+    return filename, None, scene['date']
+
+
+def _write_cog(path, region_coords, sha256=None):
+    # Every PNG capture gets a COG sidecar for thumbnails and windowed
+    # inference. It is an optimization: without it (e.g. rasterio missing)
+    # readers fall back to the PNG, so a failure never fails the capture.
+    try:
+        with metrics.span('write_cog'):
+            ensure_cog(path, region_coords, sha256)
+    except Exception as e:
+        logger.warning("Could not write COG for %s: %s", path, e)
+
+
+def find_recent_capture(lat, lon, size_km=5):
+    """Return (filename, image_date) of a recent cached capture of this square, if any."""
+    region = image_cache.region_key(region_bounds(lat, lon, size_km), THUMB_DIMENSIONS, VIS_PARAMS)
+    return image_cache.find_recent(region, SCAN_REUSE_SECONDS)
+
+
+def get_current_location():
+    """Fetch the user's current location based on IP address."""
+    try:
+        response = get_http_session().get("https://ipinfo.io/json", timeout=HTTP_TIMEOUT)
+        data = response.json()
+        location = data.get("loc").split(",")
+        latitude = float(location[0])
+        longitude = float(location[1])
+        return latitude, longitude
+    except Exception:
+        return None, None
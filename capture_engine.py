@@ -0,0 +1,103 @@
+import random
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+MAX_WORKERS = 4
+TASK_TIMEOUT_SECONDS = 180
+MAX_RETRIES = 3
+BACKOFF_SECONDS = 2.0
+
+# Earth Engine reports quota and rate limiting through these messages
+QUOTA_ERROR_MARKERS = (
+    'quota',
+    'too many concurrent',
+    'too many requests',
+    'rate limit',
+)
+# HTTP 429 as a standalone number, so coordinates and filenames such as
+# sat_31.4290_... are not mistaken for it
+QUOTA_STATUS_PATTERN = re.compile(r'(?<![\w.])429(?![\w.])')
+
+
+def is_quota_error(error_msg):
+    """Check whether a capture error came from Earth Engine quota limits."""
+    if not error_msg:
+        return False
+    error_msg = error_msg.lower()
+    return (any(marker in error_msg for marker in QUOTA_ERROR_MARKERS)
+            or QUOTA_STATUS_PATTERN.search(error_msg) is not None)
+
+
+def _capture_with_retries(capture_fn, lat, lon, started, index, max_retries, backoff):
+    started[index] = time.monotonic()
+    attempt = 0
+    while True:
+        attempt += 1
+        filename, error_msg, image_date = capture_fn(lat, lon)
+        if not is_quota_error(error_msg) or attempt > max_retries:
+            break
+        # Exponential backoff with jitter so workers don't retry in lockstep
+        time.sleep(backoff * 2 ** (attempt - 1) * (1 + random.random()))
+    return {
+        'lat': lat,
+        'lon': lon,
+        'filename': filename,
+        'error': error_msg,
+        'image_date': image_date,
+        'attempts': attempt,
+    }
+
+
+def capture_many(targets, capture_fn, max_workers=MAX_WORKERS,
+                 task_timeout=TASK_TIMEOUT_SECONDS, max_retries=MAX_RETRIES,
+                 backoff=BACKOFF_SECONDS, on_progress=None):
+    """
+    Capture a list of (lat, lon) targets concurrently with a bounded worker pool.
+
+    capture_fn has the get_satellite_image signature and return value. Results
+    are returned in target order; on_progress(done, total, result) is called
+    from the calling thread as each task finishes, so it is safe to update
+    Streamlit elements from it.
+    """
+    targets = list(targets)
+    total = len(targets)
+    results = [None] * total
+    started = {}
+    done_count = 0
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='capture')
+    try:
+        pending = {
+            executor.submit(_capture_with_retries, capture_fn, lat, lon,
+                            started, i, max_retries, backoff): i
+            for i, (lat, lon) in enumerate(targets)
+        }
+        while pending:
+            finished, _ = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            now = time.monotonic()
+            for future, i in list(pending.items()):
+                # A task can finish after wait() returned; collect it rather than time it out
+                if future in finished or future.done():
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        lat, lon = targets[i]
+                        result = {'lat': lat, 'lon': lon, 'filename': None,
+                                  'error': str(e), 'image_date': None, 'attempts': 1}
+                elif i in started and now - started[i] > task_timeout:
+                    # The worker thread can't be interrupted; its result is discarded
+                    lat, lon = targets[i]
+                    result = {'lat': lat, 'lon': lon, 'filename': None,
+                              'error': f"Capture timed out after {task_timeout}s",
+                              'image_date': None, 'attempts': 1}
+                else:
+                    continue
+                del pending[future]
+                results[i] = result
+                done_count += 1
+                if on_progress:
+                    on_progress(done_count, total, result)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return results
@@ -0,0 +1,184 @@
+import math
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+INDEX_DB = os.path.join("satellite_images", "index.sqlite")
+CAPTURE_FILENAME = re.compile(r"^sat_(-?\d+\.\d+)_(-?\d+\.\d+)_(\d{8}_\d{6})\.(?:png|npy)$")
+EARTH_RADIUS_KM = 6371.0
+
+_conn = None
+_conn_lock = threading.Lock()
+
+
+def _get_conn():
+    # One shared connection keeps queries in the sub-millisecond range
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(INDEX_DB), exist_ok=True)
+        conn = sqlite3.connect(INDEX_DB, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS captures (
+                id INTEGER PRIMARY KEY,
+                path TEXT UNIQUE NOT NULL,
+                lat REAL NOT NULL,
+                lon REAL NOT NULL,
+                captured_at REAL NOT NULL,
+                scene_id TEXT,
+                image_date TEXT
+            )
+        """)
+        conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS captures_rtree USING rtree(
+                id, min_lat, max_lat, min_lon, max_lon, min_t, max_t
+            )
+        """)
+        _conn = conn
+    return _conn
+
+
+def parse_capture_filename(name):
+    """Parse sat_{lat}_{lon}_{YYYYmmdd_HHMMSS}.png (or .npy) into (lat, lon, datetime), or None."""
+    match = CAPTURE_FILENAME.match(os.path.basename(name))
+    if not match:
+        return None
+    lat, lon, timestamp = match.groups()
+    return float(lat), float(lon), datetime.strptime(timestamp, "%Y%m%d_%H%M%S")
+
+
+def _insert(conn, path, lat, lon, captured_at, scene_id, image_date):
+    cursor = conn.execute(
+        "INSERT OR IGNORE INTO captures (path, lat, lon, captured_at, scene_id, image_date) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (path, lat, lon, captured_at, scene_id, image_date)
+    )
+    if cursor.rowcount:
+        conn.execute(
+            "INSERT INTO captures_rtree VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (cursor.lastrowid, lat, lat, lon, lon, captured_at, captured_at)
+        )
+    return cursor.rowcount
+
+
+def add_capture(path, lat, lon, captured_at=None, scene_id=None, image_date=None):
+    """Record a capture written to disk. captured_at is a datetime (default now)."""
+    captured_at = (captured_at or datetime.now()).timestamp()
+    with _conn_lock:
+        conn = _get_conn()
+        with conn:
+            _insert(conn, path, lat, lon, captured_at, scene_id, image_date)
+
+
+def remove_captures(paths):
+    """Forget captures deleted from disk. Returns the number removed."""
+    removed = 0
+    with _conn_lock:
+        conn = _get_conn()
+        with conn:
+            for path in paths:
+                row = conn.execute("SELECT id FROM captures WHERE path = ?", (path,)).fetchone()
+                if row:
+                    conn.execute("DELETE FROM captures_rtree WHERE id = ?", row)
+                    conn.execute("DELETE FROM captures WHERE id = ?", row)
+                    removed += 1
+    return removed
+
+
+def backfill(directory="satellite_images"):
+    """Index existing captures from their filenames. Returns the number added."""
+    added = 0
+    with _conn_lock:
+        conn = _get_conn()
+        with conn:
+            for entry in os.scandir(directory):
+                parsed = parse_capture_filename(entry.name)
+                if parsed is None:
+                    continue
+                lat, lon, captured_at = parsed
+                added += _insert(conn, entry.path, lat, lon, captured_at.timestamp(), None, None)
+    return added
+
+
+def _rows(rows):
+    return [
+        {'path': path, 'lat': lat, 'lon': lon,
+         'captured_at': datetime.fromtimestamp(captured_at),
+         'scene_id': scene_id, 'image_date': image_date}
+        for path, lat, lon, captured_at, scene_id, image_date in rows
+    ]
+
+
+def query_bbox(south, west, north, east, start=None, end=None):
+    """Return captures inside a bounding box, optionally within [start, end] datetimes."""
+    min_t = start.timestamp() if start else -math.inf
+    max_t = end.timestamp() if end else math.inf
+    # The R-tree stores float32 bounds, rounded outward (timestamps by up to
+    # ~2 minutes), so it only narrows the candidates by overlap; the exact
+    # test runs on the float64 columns
+    with _conn_lock:
+        rows = _get_conn().execute("""
+            SELECT c.path, c.lat, c.lon, c.captured_at, c.scene_id, c.image_date
+            FROM captures_rtree r JOIN captures c ON c.id = r.id
+            WHERE r.max_lat >= ? AND r.min_lat <= ? AND r.max_lon >= ? AND r.min_lon <= ?
+              AND r.max_t >= ? AND r.min_t <= ?
+              AND c.lat BETWEEN ? AND ? AND c.lon BETWEEN ? AND ? AND c.captured_at BETWEEN ? AND ?
+            ORDER BY c.captured_at DESC
+        """, (south, north, west, east, min_t, max_t,
+              south, north, west, east, min_t, max_t)).fetchall()
+    return _rows(rows)
+
+
+def version():
+    """Cheap token that changes whenever captures are added or removed, for cache keys."""
+    with _conn_lock:
+        return tuple(_get_conn().execute("SELECT COUNT(*), COALESCE(MAX(id), 0) FROM captures").fetchone())
+
+
+def point_arrays(south=-90, west=-180, north=90, east=180):
+    """
+    Return (lat, lon, captured_at) NumPy arrays of every capture in a box,
+    for rendering large archives without building a dict per capture.
+    """
+    import numpy as np
+
+    with _conn_lock:
+        rows = _get_conn().execute("""
+            SELECT c.lat, c.lon, c.captured_at
+            FROM captures_rtree r JOIN captures c ON c.id = r.id
+            WHERE r.max_lat >= ? AND r.min_lat <= ? AND r.max_lon >= ? AND r.min_lon <= ?
+              AND c.lat BETWEEN ? AND ? AND c.lon BETWEEN ? AND ?
+        """, (south, north, west, east, south, north, west, east)).fetchall()
+    columns = np.array(rows, dtype=np.float64).reshape(-1, 3)
+    return columns[:, 0], columns[:, 1], columns[:, 2]
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points in km."""
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = (math.sin(dlat / 2) ** 2
+         + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def nearest(lat, lon, k=5, max_km=500):
+    """
+    Return up to k captures closest to (lat, lon) within max_km, nearest first,
+    each with a 'distance_km' field. Searches R-tree windows of growing size.
+    """
+    radius_km = min(10.0, max_km)
+    while True:
+        dlat = radius_km / 111.32
+        dlon = radius_km / (111.32 * max(math.cos(math.radians(lat)), 0.01))
+        candidates = query_bbox(lat - dlat, lon - dlon, lat + dlat, lon + dlon)
+        for row in candidates:
+            row['distance_km'] = haversine_km(lat, lon, row['lat'], row['lon'])
+        # Only trust the window once it holds k hits inside its inscribed circle
+        within = sorted((r for r in candidates if r['distance_km'] <= radius_km),
+                        key=lambda r: r['distance_km'])
+        if len(within) >= k or radius_km >= max_km:
+            return within[:k]
+        radius_km = min(radius_km * 4, max_km)
@@ -0,0 +1,262 @@
+"""
+Deduplicate, recompress and prune the capture archive.
+
+    python compaction.py                                # dedupe + lossless WebP
+    python compaction.py --max-age-days 180 --max-gb 20
+    python compaction.py --no-recompress --dry-run      # report usage only
+
+Captures stay readable under their original sat_*.png names, which become
+hard links into the content-addressed object store (see blob_store).
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+import blob_store
+import capture_index
+import image_cache
+import raster_store
+from capture import BAND_CAPTURE_DIR, CAPTURE_DIR
+
+# Lossless WebP effort (0-6); 4 gets most of the size win at a fraction of the encode time
+WEBP_METHOD = 4
+
+
+def _sidecar_size(path):
+    try:
+        return os.path.getsize(raster_store.cog_path_for(path))
+    except FileNotFoundError:
+        return 0
+
+
+def _scan():
+    # Every name that can share an object: archive captures (with their
+    # capture time, for retention) and image cache entries, each with the
+    # size of its COG sidecar
+    names = []
+    for directory in (CAPTURE_DIR, BAND_CAPTURE_DIR):
+        if not os.path.isdir(directory):
+            continue
+        for entry in os.scandir(directory):
+            parsed = capture_index.parse_capture_filename(entry.name)
+            if parsed and entry.is_file():
+                names.append({'path': entry.path, 'captured_at': parsed[2].timestamp(), 'stat': entry.stat(),
+                              'sidecar': _sidecar_size(entry.path)})
+    if os.path.isdir(image_cache.CACHE_DIR):
+        for entry in os.scandir(image_cache.CACHE_DIR):
+            if entry.name.endswith(('.png', '.npy')) and entry.is_file():
+                names.append({'path': entry.path, 'captured_at': None, 'stat': entry.stat(),
+                              'sidecar': _sidecar_size(entry.path)})
+    return names
+
+
+def _sidecars(names):
+    return sum(name['sidecar'] for name in names)
+
+
+def _footprint(group):
+    # Bytes a group holds on disk: its one shared file plus every name's sidecar
+    return group['size'] + _sidecars(group['names'])
+
+
+def _group_by_file(names):
+    # Names that are hard links of one another share an inode
+    objects = {(stat.st_dev, stat.st_ino): path for path, stat in blob_store.iter_objects()}
+    groups = {}
+    for name in names:
+        inode = (name['stat'].st_dev, name['stat'].st_ino)
+        group = groups.setdefault(inode, {'names': [], 'object': objects.get(inode), 'size': name['stat'].st_size})
+        group['names'].append(name)
+    return list(groups.values())
+
+
+def _dedupe(groups):
+    # Move files not yet in the object store into it; duplicates collapse onto one object
+    merged = {}
+    saved = 0
+    for group in groups:
+        if group['object'] is None:
+            first = group['names'][0]['path']
+            sha256 = blob_store.file_sha256(first)
+            existed = os.path.exists(blob_store.object_path(sha256, os.path.splitext(first)[1]))
+            group['object'] = blob_store.store(first, sha256)
+            for name in group['names'][1:]:
+                blob_store.link_or_copy(group['object'], name['path'])
+            if existed:
+                saved += group['size']
+        key = group['object']
+        if key in merged:
+            merged[key]['names'].extend(group['names'])
+        else:
+            merged[key] = group
+    return list(merged.values()), saved
+
+
+def _encode_webp(path):
+    # Lossless WebP bytes of a PNG, or None if not smaller or not pixel-identical
+    from PIL import Image
+
+    with Image.open(path) as img:
+        img.load()
+        buffer = io.BytesIO()
+        img.save(buffer, 'WEBP', lossless=True, quality=100, method=WEBP_METHOD, exact=True)
+        if buffer.tell() >= os.path.getsize(path):
+            return None
+        buffer.seek(0)
+        with Image.open(buffer) as encoded:
+            if encoded.mode != img.mode or not np.array_equal(np.asarray(encoded), np.asarray(img)):
+                return None
+    return buffer.getvalue()
+
+
+def _recompress(groups):
+    """
+    Re-encode PNG objects as lossless WebP and relink their names. Names keep
+    their .png suffix; every reader (PIL, and rasterio via PIL conversion)
+    detects the format from the file contents. The PNG's hash becomes an
+    alias of the WebP object, so predictions cached for it still hit and
+    later identical PNG captures still dedupe onto it.
+    """
+    recompressed = saved = 0
+    for group in groups:
+        obj = group['object']
+        if not obj or not blob_store.is_object(obj) or not obj.endswith('.png'):
+            continue
+        data = _encode_webp(obj)
+        if data is None:
+            continue
+        tmp_path = f"{obj}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        webp_sha256 = hashlib.sha256(data).hexdigest()
+        webp_obj = blob_store.store(tmp_path, webp_sha256, extension='.webp')
+        blob_store.add_alias(os.path.splitext(os.path.basename(obj))[0], webp_obj, webp_sha256)
+        for name in group['names']:
+            blob_store.link_or_copy(webp_obj, name['path'])
+            if name['captured_at'] is None:
+                image_cache.update_file(name['path'], len(data), webp_sha256)
+        os.remove(tmp_path)
+        os.remove(obj)
+        saved += group['size'] - len(data)
+        group['object'], group['size'] = webp_obj, len(data)
+        recompressed += 1
+    return recompressed, saved
+
+
+def _delete_capture(name):
+    for path in (name['path'], raster_store.cog_path_for(name['path'])):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _apply_retention(groups, max_age_days=None, max_bytes=None):
+    # Expire captures past max_age_days, then drop the oldest until the
+    # captures fit in max_bytes. Files only the image cache refers to can't be
+    # freed here (the cache has its own budget), so they don't count toward
+    # the quota; returns the deleted paths and the bytes left in total
+    deleted = []
+    cutoff = time.time() - max_age_days * 86400 if max_age_days else None
+    oldest_first = sorted(
+        (group for group in groups if any(n['captured_at'] for n in group['names'])),
+        key=lambda group: max(n['captured_at'] or 0 for n in group['names'])
+    )
+    total = sum(_footprint(group) for group in oldest_first)
+    cache_only = sum(_footprint(group) for group in groups) - total
+    for group in oldest_first:
+        captures = [n for n in group['names'] if n['captured_at'] is not None]
+        expired = [n for n in captures if cutoff and n['captured_at'] < cutoff]
+        over_quota = max_bytes is not None and total > max_bytes
+        doomed = captures if over_quota else expired
+        if not doomed:
+            continue
+        for name in doomed:
+            _delete_capture(name)
+            deleted.append(name['path'])
+        total -= _sidecars(doomed)
+        if len(doomed) == len(captures):
+            # Nothing in the archive refers to the file any more; free it from the cache too
+            cached = [n for n in group['names'] if n['captured_at'] is None]
+            for name in cached:
+                _delete_capture(name)
+            total -= group['size'] + _sidecars(cached)
+    capture_index.remove_captures(deleted)
+    return deleted, total + cache_only
+
+
+def _collect_orphan_sidecars(names):
+    # COGs whose source PNG was deleted outside compaction (or by image_cache
+    # before it removed sidecars); returns the number removed and bytes freed
+    if not os.path.isdir(raster_store.COG_DIR):
+        return 0, 0
+    live = {raster_store.cog_path_for(name['path']) for name in names if os.path.exists(name['path'])}
+    removed = freed = 0
+    for entry in os.scandir(raster_store.COG_DIR):
+        if entry.name.endswith('.tif') and entry.path not in live:
+            freed += entry.stat().st_size
+            os.remove(entry.path)
+            removed += 1
+    return removed, freed
+
+
+def compact(recompress=True, max_age_days=None, max_bytes=None, dry_run=False):
+    """
+    Compact the archive in place and return a summary dict.
+
+    1. Move every capture and cache file into the object store, collapsing
+       byte-identical files onto a single object.
+    2. Optionally re-encode PNG objects as lossless WebP when that is smaller.
+    3. Delete captures older than max_age_days, then the oldest captures
+       until the captures and their COG sidecars fit in max_bytes, with their
+       index entries. Cached copies go with the last capture that shares them;
+       cache-only files are left to image_cache's own budget.
+    4. Delete objects no name links to any more, and COG sidecars whose
+       source file is gone.
+
+    With dry_run only the current usage is reported.
+    """
+    names = _scan()
+    groups = _group_by_file(names)
+    summary = {'files': len(names), 'bytes_before': sum(_footprint(group) for group in groups)}
+    if dry_run:
+        return summary
+
+    groups, summary['dedupe_bytes_saved'] = _dedupe(groups)
+    if recompress:
+        summary['recompressed'], summary['recompress_bytes_saved'] = _recompress(groups)
+    deleted, summary['bytes_after'] = _apply_retention(groups, max_age_days, max_bytes)
+    summary['captures_deleted'] = len(deleted)
+    summary['objects_removed'], _ = blob_store.collect_garbage()
+    summary['sidecars_removed'], _ = _collect_orphan_sidecars(names)
+    image_cache.evict()
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Deduplicate, recompress and prune the capture archive.")
+    parser.add_argument('--no-recompress', action='store_true', help="skip lossless WebP re-encoding")
+    parser.add_argument('--max-age-days', type=float, help="delete captures older than this")
+    parser.add_argument('--max-gb', type=float,
+                        help="delete the oldest captures until they fit (the image cache has its own budget)")
+    parser.add_argument('--dry-run', action='store_true', help="only report current usage")
+    args = parser.parse_args(argv)
+
+    summary = compact(
+        recompress=not args.no_recompress,
+        max_age_days=args.max_age_days,
+        max_bytes=int(args.max_gb * 1024 ** 3) if args.max_gb else None,
+        dry_run=args.dry_run,
+    )
+    print(json.dumps(summary, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,11 +1,19 @@
 import streamlit as st
-import ee
+import copy
 import os
-import requests
-import geemap.foliumap as geemap
 from datetime import datetime
-import time
-import folium
+
+import capture_index
+import map_layers
+import metrics
+from capture import get_current_location
+from grid_scan import make_grid
+from inference_queue import queue_stats
+from job_queue import DONE, FAILED, QUEUED, RUNNING, get_job, resume_jobs, submit_job
+from landslide_model import BACKEND, BACKENDS
+from raster_store import THUMBNAIL_SIZE, read_thumbnail
+from risk_heatmap import MAX_ZOOM as HEATMAP_MAX_ZOOM, define_region, list_regions, tile_url
+from watchlist import add_site, list_sites, remove_site
 
 # Set page config as the first Streamlit command
 st.set_page_config(
@@ -13,99 +21,253 @@ st.set_page_config(
     layout="wide"
 )
 
-# Initialize Earth Engine with service account credentials
-service_account = ''
-credentials = ee.ServiceAccountCredentials(service_account, '')
+# Heavy modules (ee, geemap, folium, requests, tensorflow) are imported on
+# first use so the page renders before they load; see benchmarks/startup_benchmark.py
+
+# Number of recent job IDs kept in the page URL
+JOBS_IN_URL = 10
+# Longest side, in pixels, of a capture drawn on the map; a 5 km capture
+# spans roughly this many screen pixels at the deepest useful zoom
+MAP_OVERLAY_SIZE = 1024
+# Base maps kept per process; heatmap tile URLs carry a version, so every
+# heatmap update adds a new entry and older ones must be evicted
+BASE_MAP_CACHE_ENTRIES = 8
+@st.cache_resource
+def get_capture_index():
+    """Backfill the spatial index from existing filenames once per process."""
+    capture_index.backfill()
+    return capture_index
+
+@st.cache_resource
+def get_job_workers():
+    """Resume jobs interrupted by a previous server process, once per process."""
+    resume_jobs()
+    return True
+
+@st.cache_resource
+def get_metrics_server():
+    """Start the Prometheus endpoint once per process if GEOSHIELD_METRICS_PORT is set."""
+    return metrics.start_metrics_server()
+
+def track_job(job_id):
+    """Follow a job in this session and keep its ID in the URL so it survives reloads."""
+    st.session_state.job_ids.append(job_id)
+    st.experimental_set_query_params(jobs=",".join(st.session_state.job_ids[-JOBS_IN_URL:]))
+
+def apply_job_result(job):
+    """Update the session (last capture, overlays) from a newly finished job."""
+    result = job['result']
+    if job['kind'] == 'capture':
+        st.session_state.last_capture = result['filename']
+        st.session_state.last_capture_bounds = result['bounds']
+        st.session_state.last_raster = result['raster']
+        st.session_state.last_overlay = None
+    elif job['kind'] == 'predict' and result['filename'] == st.session_state.last_capture:
+        st.session_state.last_overlay = result['overlay']
+
+def show_jobs():
+    """Show this session's jobs without waiting on any of them."""
+    if not st.session_state.job_ids:
+        return
+    st.subheader("Jobs")
+    jobs = [job for job in map(get_job, st.session_state.job_ids[-JOBS_IN_URL:]) if job]
+    # Apply results oldest first so the newest capture ends up as the current one
+    for job in jobs:
+        if job['status'] == DONE and job['id'] not in st.session_state.applied_jobs:
+            st.session_state.applied_jobs.add(job['id'])
+            apply_job_result(job)
 
-try:
-    ee.Initialize(credentials)
-except Exception as e:
-    st.error(f"Earth Engine initialization error: {e}")
+    pending = False
+    for job in reversed(jobs):
+        label = f"{job['kind'].title()} job {job['id'][:8]}"
+        result = job['result']
+        if job['status'] in (QUEUED, RUNNING):
+            pending = True
+            if job['progress']:
+                done, total = job['progress']
+                st.info(f"{label}: {done} of {total} done...")
+                st.progress(done / total if total else 1.0)
+            else:
+                st.info(f"{label}: {job['status']}...")
+        elif job['status'] == FAILED:
+            st.error(f"{label} failed: {job['error']}")
+        elif job['kind'] == 'capture':
+            st.image(capture_thumbnail(result['raster']) if result['raster'] else result['filename'],
+                     caption=f"Satellite image captured on {result['image_date']}", use_column_width=True)
+        elif job['kind'] == 'batch':
+            for capture in result['captures']:
+                where = f"({capture['lat']:.4f}, {capture['lon']:.4f})"
+                if capture['filename']:
+                    st.image(capture['filename'], caption=f"{where} captured on {capture['image_date']}",
+                             use_column_width=True)
+                else:
+                    st.error(f"{where}: {capture['error']}")
+        elif job['kind'] == 'scan':
+            if result['failed']:
+                st.warning(f"{result['failed']} of {result['tiles']} tiles could not be captured.")
+            st.image(result['mosaic'], caption=f"{result['tiles']} tiles of {result['tile_km']:g} km",
+                     use_column_width=True)
+        elif job['kind'] == 'heatmap':
+            for summary in result['regions']:
+                st.success(f"{label}: {summary['region']} updated {summary['updated']} of "
+                           f"{summary['cells']} cells ({summary['tiles']} map tiles)")
+                if summary['failed']:
+                    st.warning(f"{len(summary['failed'])} cells failed: {summary['failed'][0]['error']}")
+        elif job['kind'] == 'watchlist':
+            st.success(f"{label}: {len(result['new'])} of {result['checked']} sites had new imagery")
+            for site in result['new']:
+                score = f"risk {site['risk_score']:.1%}" if site['risk_score'] is not None else "not scored"
+                st.markdown(f"- **{site['name']}**: scene of {site['image_date']}, {score}")
+            for site in result['failed']:
+                st.warning(f"{site['name']}: {site['error']}")
+        else:
+            st.metric("Landslide risk", f"{result['risk_score']:.1%} of area")
+            st.image(result['overlay'], caption='Predicted landslide risk zones', use_column_width=True)
+    if pending:
+        st.button("Refresh Job Status")
 
-# Create directory for storing images if it doesn't exist
-os.makedirs("satellite_images", exist_ok=True)
+@st.cache_data
+def capture_thumbnail(raster_path, max_size=THUMBNAIL_SIZE):
+    """Read a capture from its COG overviews at display size instead of decoding the full image."""
+    return read_thumbnail(raster_path, max_size)
 
-def get_satellite_image(lat, lon, size_km=5):
+@st.cache_data
+def map_overlay_url(image_path, mtime, max_size=MAP_OVERLAY_SIZE):
     """
-    Fetch a satellite image of a specified region using Google Earth Engine.
+    Encode a capture (COG) or risk overlay (PNG) at map display size as a JPEG
+    data URL, once per file version (mtime). Handing folium the path or array
+    would make it PNG-encode or base64-inline the full image on every rerun.
     """
-    try:
-        km_to_deg = size_km / 111.32
-        region = ee.Geometry.Rectangle([
-            lon - km_to_deg / 2, lat - km_to_deg / 2,
-            lon + km_to_deg / 2, lat + km_to_deg / 2
-        ])
-        image = (ee.ImageCollection('COPERNICUS/S2_SR')
-                .filterBounds(region)
-                .filterDate(ee.Date('2024-01-01'), ee.Date(datetime.now().strftime('%Y-%m-%d')))
-                .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20))
-                .sort('system:time_start', False)
-                .first())
-        if image is None:
-            return None, "No clear images available for this location", None
-
-        vis_params = {
-            'min': 0,
-            'max': 3000,
-            'bands': ['B4', 'B3', 'B2'],
-            'gamma': 1.4
-        }
-
-        url = image.getThumbURL({
-            'region': region,
-            'dimensions': '2048',
-            'format': 'png',
-            'bands': ['B4', 'B3', 'B2'],
-            'min': 0,
-            'max': 3000,
-            'gamma': 1.4
-        })
+    import base64
+    import io
 
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"satellite_images/sat_{lat:.4f}_{lon:.4f}_{timestamp}.png"
-        
-        response = requests.get(url)
-        with open(filename, 'wb') as f:
-            f.write(response.content)
+    from PIL import Image
 
-        image_date = ee.Date(image.get('system:time_start')).format('YYYY-MM-dd').getInfo()
-        return filename, None, image_date
+    if image_path.lower().endswith(('.tif', '.tiff')):
+        img = Image.fromarray(capture_thumbnail(image_path, max_size))
+    else:
+        with Image.open(image_path) as src:
+            img = src.convert('RGB')
+        img.thumbnail((max_size, max_size))
+    buffer = io.BytesIO()
+    img.convert('RGB').save(buffer, 'JPEG', quality=85)
+    return "data:image/jpeg;base64," + base64.b64encode(buffer.getvalue()).decode('ascii')
 
-    except Exception as e:
-        return None, str(e), None
+@st.cache_data
+def archive_point_layers(capture_version, risk_version):
+    """
+    Export the capture and risk point layers once per archive version; reruns
+    with an unchanged archive only pay for the two version queries.
+    """
+    return map_layers.export_capture_points(), map_layers.export_risk_points()
 
+@st.cache_data
 def create_lat_lon_graticules():
-    """Create latitude and longitude graticules"""
-    graticules = []
-    
+    """
+    Create latitude and longitude graticules as a single GeoJSON FeatureCollection.
+    Parallels and meridians are straight lines on the web map, so each needs
+    only its two end points. Cached across sessions and reruns.
+    """
+    features = []
+
     for lat in range(-90, 91, 10):
-        points = [[lat, lon] for lon in range(-180, 181, 2)]
-        graticules.append({
-            'coords': points,
-            'label': f'{lat}°N' if lat > 0 else (f'{abs(lat)}°S' if lat < 0 else 'Equator')
+        features.append({
+            'type': 'Feature',
+            'geometry': {'type': 'LineString', 'coordinates': [[-180, lat], [180, lat]]},
+            'properties': {'label': f'{lat}°N' if lat > 0 else (f'{abs(lat)}°S' if lat < 0 else 'Equator')}
         })
-    
+
     for lon in range(-180, 181, 10):
-        points = [[lat, lon] for lat in range(-90, 91, 2)]
-        graticules.append({
-            'coords': points,
-            'label': f'{lon}°E' if lon > 0 else (f'{abs(lon)}°W' if lon < 0 else 'Prime Meridian')
+        features.append({
+            'type': 'Feature',
+            'geometry': {'type': 'LineString', 'coordinates': [[lon, -90], [lon, 90]]},
+            'properties': {'label': f'{lon}°E' if lon > 0 else (f'{abs(lon)}°W' if lon < 0 else 'Prime Meridian')}
         })
-    
-    return graticules
-
-def get_current_location():
-    """Fetch the user's current location based on IP address."""
-    try:
-        response = requests.get("https://ipinfo.io/json")
-        data = response.json()
-        location = data.get("loc").split(",")
-        latitude = float(location[0])
-        longitude = float(location[1])
-        return latitude, longitude
-    except Exception as e:
-        st.error(f"Error fetching location: {e}")
-        return None, None
+
+    return {'type': 'FeatureCollection', 'features': features}
+
+@st.cache_resource(max_entries=BASE_MAP_CACHE_ENTRIES)
+def build_base_map(map_type, heatmap_layers=()):
+    """
+    Build the base map (tiles, graticules, controls) once per map type and
+    set of heatmap layers, given as (region name, tile URL) pairs. The map
+    is shared by every session, so callers must add to a copy of it.
+    """
+    import folium
+    import geemap.foliumap as geemap
+
+    if map_type == "Labeled Map":
+        m = geemap.Map(center=[20, 0], zoom=2)  # Using geemap for labeled map
+        folium.TileLayer('OpenStreetMap', attr='OpenStreetMap contributors').add_to(m)
+    else:  # Terrain Map
+        m = geemap.Map(center=[20, 0], zoom=2, basemap='HYBRID')  # Using hybrid basemap
+
+    # Add graticules (lat/lon grid) as one layer; labels show as hover tooltips
+    folium.GeoJson(
+        create_lat_lon_graticules(),
+        name='Graticules',
+        style_function=lambda feature: {'color': 'white', 'weight': 0.5, 'opacity': 0.5},
+        tooltip=folium.GeoJsonTooltip(fields=['label'], labels=False, sticky=True)
+    ).add_to(m)
+
+    # Precomputed risk heatmaps are static tiles, so showing them costs no inference
+    for name, url in heatmap_layers:
+        folium.TileLayer(
+            url, name=f'Landslide risk: {name}', attr='GeoShield risk heatmap',
+            overlay=True, max_native_zoom=HEATMAP_MAX_ZOOM, max_zoom=18, opacity=0.8
+        ).add_to(m)
+
+    m.add_child(folium.LatLngPopup())
+    folium.LayerControl().add_to(m)
+    return m
+
+def build_map_overlays():
+    """Build the per-session overlays (marker, capture footprint, risk mask) sent as map updates."""
+    import folium
+
+    overlays = folium.FeatureGroup(name='Overlays')
+
+    # Add marker for selected location or current location
+    if st.session_state.marker_location:
+        folium.Marker(
+            location=st.session_state.marker_location,
+            popup='Selected Location'
+        ).add_to(overlays)
+    elif st.session_state.latitude and st.session_state.longitude:
+        folium.Marker(
+            location=(st.session_state.latitude, st.session_state.longitude),
+            popup='Current Location',
+            icon=folium.Icon(color='blue')
+        ).add_to(overlays)
+
+    if st.session_state.last_capture_bounds:
+        west, south, east, north = st.session_state.last_capture_bounds
+        bounds = [[south, west], [north, east]]
+        # Overlays are passed as cached, display-sized data URLs so a rerun
+        # doesn't re-encode them
+        # The PNG stands in for the COG when rasterio couldn't write one
+        capture_image = st.session_state.last_raster or st.session_state.last_capture
+        if capture_image:
+            folium.raster_layers.ImageOverlay(map_overlay_url(capture_image, os.path.getmtime(capture_image)),
+                                              bounds).add_to(overlays)
+        folium.Rectangle(bounds, color='yellow', weight=2, fill=False,
+                         tooltip='Last capture').add_to(overlays)
+        if st.session_state.last_overlay:
+            overlay = st.session_state.last_overlay
+            folium.raster_layers.ImageOverlay(map_overlay_url(overlay, os.path.getmtime(overlay)), bounds,
+                                              opacity=0.6).add_to(overlays)
+    return overlays
+
+def parse_targets(text):
+    """Parse one 'lat, lon' pair per line into a list of (lat, lon) tuples."""
+    targets = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        lat, lon = (float(v) for v in line.replace(';', ',').split(',')[:2])
+        targets.append((lat, lon))
+    return targets
 
 def main():
     st.title("🌍 Interactive Globe Satellite Image Capturing and Natural Disaster Predictor")
@@ -117,10 +279,23 @@ def main():
         st.session_state.latitude = 0.0
     if 'longitude' not in st.session_state:
         st.session_state.longitude = 0.0
-    if 'alert' not in st.session_state:
-        st.session_state.alert = None
-    if 'alert_time' not in st.session_state:
-        st.session_state.alert_time = None
+    if 'last_capture' not in st.session_state:
+        st.session_state.last_capture = None
+    if 'last_capture_bounds' not in st.session_state:
+        st.session_state.last_capture_bounds = None
+    if 'last_raster' not in st.session_state:
+        st.session_state.last_raster = None
+    if 'last_overlay' not in st.session_state:
+        st.session_state.last_overlay = None
+    if 'job_ids' not in st.session_state:
+        # Pick up jobs from the URL so they survive page reloads and can be shared
+        job_param = st.experimental_get_query_params().get('jobs', [''])[0]
+        st.session_state.job_ids = [job_id for job_id in job_param.split(',') if job_id]
+    if 'applied_jobs' not in st.session_state:
+        st.session_state.applied_jobs = set()
+
+    get_job_workers()
+    get_metrics_server()
 
     # Create two columns for layout
     col1, col2 = st.columns([2, 1])
@@ -129,43 +304,10 @@ def main():
         st.header("Map View")
         # Add a dropdown to select map type
         map_type = st.selectbox("Select Map Type", ["Labeled Map", "Terrain Map"])
+        map_view = st.radio("Map view", ["Interactive", "Archive overview"], horizontal=True)
+        show_heatmap = st.checkbox("Show risk heatmap", value=True)
+        map_placeholder = st.empty()
 
-        # Create the Map with the selected type
-        if map_type == "Labeled Map":
-            m = geemap.Map(center=[20, 0], zoom=2)  # Using geemap for labeled map
-            folium.TileLayer('OpenStreetMap', attr='OpenStreetMap contributors').add_to(m)
-        else:  # Terrain Map
-            m = geemap.Map(center=[20, 0], zoom=2, basemap='HYBRID')  # Using hybrid basemap
-        folium.LayerControl().add_to(m)
-
-        # Add graticules (lat/lon grid)
-        graticules = create_lat_lon_graticules()
-        for g in graticules:
-            folium.PolyLine(
-                locations=[[p[0], p[1]] for p in g['coords']],
-                weight=0.5,
-                color='white',
-                opacity=0.5,
-                popup=g['label']
-            ).add_to(m)
-
-        m.add_child(folium.LatLngPopup())
-
-        # Add marker for selected location or current location
-        if st.session_state.marker_location:
-            folium.Marker(
-                location=st.session_state.marker_location,
-                popup='Selected Location'
-            ).add_to(m)
-        elif st.session_state.latitude and st.session_state.longitude:
-            folium.Marker(
-                location=(st.session_state.latitude, st.session_state.longitude),
-                popup='Current Location',
-                icon=folium.Icon(color='blue')
-            ).add_to(m)
-
-        # Display the map
-        m.to_streamlit(height=600)
 
     with col2:
         st.header("Select Location")
@@ -192,32 +334,126 @@ def main():
             st.session_state.longitude = lon
             st.experimental_rerun()
         
-        # Display temporary alerts
-        current_time = time.time()
-        if st.session_state.alert and st.session_state.alert_time:
-            if current_time - st.session_state.alert_time < 3:
-                if "error" in st.session_state.alert:
-                    st.error(st.session_state.alert)
-                elif "success" in st.session_state.alert:
-                    st.success(st.session_state.alert)
-            else:
-                st.session_state.alert = None
-
-        # Button to capture satellite image
+        # Button to capture satellite image; runs as a background job
         if st.button("Capture Satellite Image"):
             if st.session_state.marker_location or (st.session_state.latitude and st.session_state.longitude):
                 lat = st.session_state.marker_location[0] if st.session_state.marker_location else st.session_state.latitude
                 lon = st.session_state.marker_location[1] if st.session_state.marker_location else st.session_state.longitude
-                filename, error_msg, image_date = get_satellite_image(lat, lon)
-                if error_msg:
-                    st.session_state.alert = f"Error: {error_msg}"
-                    st.session_state.alert_time = time.time()
-                else:
-                    st.session_state.alert = f"Success: Image captured on {image_date}!"
-                    st.session_state.alert_time = time.time()
-                    st.image(filename, caption='Captured Satellite Image', use_column_width=True)
+                track_job(submit_job('capture', {'lat': lat, 'lon': lon, 'size_km': 5}))
             else:
                 st.error("Please select a location first.")
+
+        # Landslide risk prediction for the most recent capture
+        backend = st.selectbox("Inference backend", BACKENDS, index=BACKENDS.index(BACKEND))
+        if st.session_state.last_capture and st.button("Predict Landslide Risk"):
+            track_job(submit_job('predict', {'filename': st.session_state.last_capture, 'backend': backend}))
+
+        show_jobs()
+
+        # Batch capture of several locations at once
+        with st.expander("Capture Multiple Locations"):
+            targets_text = st.text_area("Coordinates (one 'lat, lon' per line)", height=120)
+            max_workers = st.slider("Concurrent captures", 1, 16, 4)
+            if st.button("Capture All"):
+                try:
+                    targets = parse_targets(targets_text)
+                except ValueError:
+                    targets = None
+                    st.error("Could not parse coordinates. Use one 'lat, lon' pair per line.")
+                if targets:
+                    track_job(submit_job('batch', {'targets': targets, 'max_workers': max_workers}))
+                    st.info(f"Capture of {len(targets)} locations queued; results appear under 'Jobs'.")
+
+        # Grid scan of a whole bounding box
+        with st.expander("Scan Region"):
+            north = st.number_input("North", value=st.session_state.latitude + 0.1, format="%.6f")
+            south = st.number_input("South", value=st.session_state.latitude - 0.1, format="%.6f")
+            west = st.number_input("West", value=st.session_state.longitude - 0.1, format="%.6f")
+            east = st.number_input("East", value=st.session_state.longitude + 0.1, format="%.6f")
+            tile_km = st.number_input("Tile size (km)", min_value=1.0, max_value=50.0, value=5.0)
+            scan_workers = st.slider("Concurrent tile captures", 1, 16, 4)
+            if st.button("Scan Region"):
+                try:
+                    tiles = make_grid(south, west, north, east, tile_km)
+                except ValueError as e:
+                    tiles = None
+                    st.error(str(e))
+                if tiles:
+                    track_job(submit_job('scan', {'south': south, 'west': west, 'north': north, 'east': east,
+                                                  'tile_km': tile_km, 'max_workers': scan_workers}))
+                    st.info(f"Scan of {len(tiles)} tiles queued; the mosaic appears under 'Jobs'.")
+
+        # Regions kept scored in the background and drawn from map tiles
+        with st.expander("Risk Heatmap"):
+            heatmap_name = st.text_input("Heatmap region name")
+            if st.button("Save Scan Region as Heatmap"):
+                try:
+                    define_region(heatmap_name, south, west, north, east, tile_km)
+                    st.success(f"Heatmap region '{heatmap_name}' saved; update it to compute the risk layer.")
+                except ValueError as e:
+                    st.error(str(e))
+            regions = list_regions()
+            if regions:
+                for region in regions:
+                    updated = datetime.fromtimestamp(region['updated']).strftime('%Y-%m-%d %H:%M') if region['updated'] else 'never'
+                    st.markdown(f"- **{region['name']}**: {region['tile_km']:g} km cells, last changed {updated}")
+                if st.button("Update Heatmaps"):
+                    track_job(submit_job('heatmap', {'backend': backend}))
+                    st.info("Heatmap update queued; only cells with new scenes are recomputed.")
+            else:
+                st.info("Save the 'Scan Region' box as a heatmap region to monitor it.")
+
+        # Sites re-checked for new Sentinel-2 scenes
+        with st.expander("Watchlist"):
+            site_name = st.text_input("Site name")
+            if st.button("Watch Selected Location"):
+                location = st.session_state.marker_location or (st.session_state.latitude, st.session_state.longitude)
+                if not site_name or not all(location):
+                    st.error("Enter a site name and select a location first.")
+                else:
+                    try:
+                        add_site(site_name, *location)
+                        st.success(f"Watching '{site_name}'.")
+                    except ValueError as e:
+                        st.error(str(e))
+            sites = list_sites()
+            if sites:
+                st.dataframe([
+                    {'Site': site['name'], 'Lat': site['lat'], 'Lon': site['lon'],
+                     'Last scene': site['last_image_date'], 'Risk': site['last_risk_score'],
+                     'Error': site['last_error']}
+                    for site in sites
+                ], use_container_width=True)
+                remove_name = st.selectbox("Site to remove", [site['name'] for site in sites])
+                if st.button("Remove Site"):
+                    remove_site(remove_name)
+                    st.experimental_rerun()
+                if st.button("Refresh Watchlist"):
+                    track_job(submit_job('watchlist', {'backend': backend}))
+                    st.info("Watchlist refresh queued; only sites with new scenes are captured and scored.")
+            else:
+                st.info("No watched sites yet.")
+
+        # Archive lookup around the selected location
+        with st.expander("Nearby Captures"):
+            if st.session_state.marker_location or (st.session_state.latitude and st.session_state.longitude):
+                near_lat, near_lon = st.session_state.marker_location or (st.session_state.latitude, st.session_state.longitude)
+                nearby = get_capture_index().nearest(near_lat, near_lon, k=5)
+                if nearby:
+                    for row in nearby:
+                        st.markdown(f"- `{os.path.basename(row['path'])}`: {row['distance_km']:.1f} km away, "
+                                    f"captured {row['captured_at']:%Y-%m-%d %H:%M}")
+                else:
+                    st.info("No archived captures within 500 km.")
+            else:
+                st.info("Select a location to list archived captures near it.")
+
+        with st.expander("Inference Queue Stats"):
+            st.json(queue_stats())
+
+        with st.expander("Metrics"):
+            st.code(metrics.render_prometheus(), language="text")
+
         st.markdown("---")
         st.markdown("""
         ### How to use:
@@ -226,7 +462,47 @@ def main():
         3. Enter the latitude and longitude manually and click on 'Update Location' or mark a point on the map to get its coordinates.
         4. Click on 'Get My Current Location' to get my device current coordinates and satellite image.
         5. Click 'Capture Satellite Image' to capture a 5x5 km² area.
+        6. Use 'Capture Multiple Locations' to capture a list of coordinates concurrently.
+        7. Use 'Scan Region' to capture and stitch a whole bounding box as a grid of tiles.
+        8. Click 'Predict Landslide Risk' to run the U-Net on the last captured image.
+        9. Captures and predictions run in the background; their progress is listed under 'Jobs'.
+        10. Add sites to the 'Watchlist' and refresh it to process only newly acquired scenes.
+        11. Save a scanned box under 'Risk Heatmap' to keep a precomputed risk layer on the map.
+        12. Switch 'Map view' to 'Archive overview' to see every capture footprint and risk score at once.
         """)
 
+    if map_view == "Archive overview":
+        # Points are fetched by the browser from static files, so even a very
+        # large archive costs this rerun nothing beyond the version queries
+        (captures_url, capture_count), (risk_url, risk_count) = archive_point_layers(
+            map_layers.capture_version(), map_layers.risk_version()
+        )
+        with map_placeholder.container():
+            st.pydeck_chart(map_layers.build_archive_deck(
+                captures_url if capture_count else None,
+                risk_url if risk_count and show_heatmap else None,
+            ), use_container_width=True)
+            st.caption(f"{capture_count} captures, {risk_count} risk points")
+        return
+
+    # Render the map last so overlays reflect actions taken in this run. Only
+    # the overlay feature group changes between reruns; the base map is reused.
+    # st_folium attaches the feature group to the map it is given, so it gets
+    # a private copy and the cached map shared by every session stays untouched.
+    from streamlit_folium import st_folium
+
+    heatmap_layers = tuple(
+        (region['name'], tile_url(region)) for region in list_regions() if region['updated']
+    ) if show_heatmap else ()
+    with map_placeholder:
+        st_folium(
+            copy.deepcopy(build_base_map(map_type, heatmap_layers)),
+            feature_group_to_add=build_map_overlays(),
+            key=f"map_{map_type}",
+            height=600,
+            use_container_width=True,
+            returned_objects=[]
+        )
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,25 @@
+import os
+import threading
+
+# Service account used to authenticate with Earth Engine
+SERVICE_ACCOUNT = os.environ.get('GEOSHIELD_EE_SERVICE_ACCOUNT', '')
+KEY_FILE = os.environ.get('GEOSHIELD_EE_KEY_FILE', '')
+
+_ee = None
+_ee_lock = threading.Lock()
+
+
+def get_ee():
+    """
+    Import and initialize the Earth Engine client on first use and return
+    the ee module. The session is shared by every caller in the process;
+    a failed initialization raises and is retried on the next call.
+    """
+    global _ee
+    with _ee_lock:
+        if _ee is None:
+            import ee
+            credentials = ee.ServiceAccountCredentials(SERVICE_ACCOUNT, KEY_FILE)
+            ee.Initialize(credentials)
+            _ee = ee
+    return _ee
@@ -0,0 +1,106 @@
+"""
+Export the Kitretsu U-Net to ONNX (optionally int8-quantized) for CPU serving,
+then check that its masks match the Keras reference on the sample captures.
+
+    python export_model.py                 # Kitretsu.h5 -> Kitretsu.onnx
+    python export_model.py --quantize      # also writes Kitretsu.int8.onnx
+    python export_model.py --check-only --onnx Kitretsu.int8.onnx
+
+Exits non-zero if any sample falls below the parity thresholds.
+"""
+import argparse
+import glob
+import os
+import sys
+from functools import partial
+
+import numpy as np
+
+import landslide_model
+
+# A served model must agree with the reference on at least this share of
+# mask pixels, and its masks must overlap the reference by this IoU
+MIN_PIXEL_AGREEMENT = 0.99
+MIN_MASK_IOU = 0.95
+
+
+def export_onnx(model_path, onnx_path, opset=13):
+    """Convert the Keras model to ONNX with a dynamic batch dimension."""
+    import tensorflow as tf
+    import tf2onnx
+
+    model = landslide_model.load_model(model_path)
+    spec = (tf.TensorSpec((None,) + tuple(model.input_shape[1:]), tf.float32, name='input'),)
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=opset, output_path=onnx_path)
+    return onnx_path
+
+
+def quantize_onnx(onnx_path, quantized_path):
+    """Apply int8 dynamic weight quantization to an exported ONNX model."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(onnx_path, quantized_path, weight_type=QuantType.QInt8)
+    return quantized_path
+
+
+def parity_check(onnx_path, samples, threshold=landslide_model.RISK_THRESHOLD):
+    """
+    Compare ONNX masks against the Keras reference on each sample image.
+    Returns one dict of metrics per sample.
+    """
+    reference_fn = partial(landslide_model.predict_patches, backend='keras')
+    candidate_fn = partial(landslide_model.predict_patches, backend='onnx', onnx_path=onnx_path)
+
+    report = []
+    for path in samples:
+        reference = landslide_model.predict_tiled(path, predict_fn=reference_fn)
+        candidate = landslide_model.predict_tiled(path, predict_fn=candidate_fn)
+        reference_mask = reference >= threshold
+        candidate_mask = candidate >= threshold
+        union = np.logical_or(reference_mask, candidate_mask).sum()
+        intersection = np.logical_and(reference_mask, candidate_mask).sum()
+        report.append({
+            'image': path,
+            'max_abs_diff': float(np.abs(reference - candidate).max()),
+            'pixel_agreement': float((reference_mask == candidate_mask).mean()),
+            # Two empty masks agree perfectly
+            'iou': float(intersection / union) if union else 1.0,
+        })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--model', default=landslide_model.MODEL_PATH)
+    parser.add_argument('--onnx', default=landslide_model.ONNX_MODEL_PATH)
+    parser.add_argument('--quantize', action='store_true',
+                        help="also write an int8 dynamically quantized model and check that one")
+    parser.add_argument('--check-only', action='store_true',
+                        help="skip export and only run the parity check on --onnx")
+    parser.add_argument('--samples', default=os.path.join('satellite_images', 'sat_*.png'))
+    args = parser.parse_args()
+
+    onnx_path = args.onnx
+    if not args.check_only:
+        export_onnx(args.model, onnx_path)
+        print(f"Exported {args.model} -> {onnx_path}")
+        if args.quantize:
+            onnx_path = quantize_onnx(onnx_path, os.path.splitext(onnx_path)[0] + '.int8.onnx')
+            print(f"Quantized -> {onnx_path}")
+
+    samples = sorted(glob.glob(args.samples))
+    if not samples:
+        print(f"No sample images match {args.samples}", file=sys.stderr)
+        return 1
+
+    failed = False
+    for row in parity_check(onnx_path, samples):
+        ok = row['pixel_agreement'] >= MIN_PIXEL_AGREEMENT and row['iou'] >= MIN_MASK_IOU
+        failed = failed or not ok
+        print(f"{'OK  ' if ok else 'FAIL'} {row['image']}: agreement={row['pixel_agreement']:.4f} "
+              f"iou={row['iou']:.4f} max_abs_diff={row['max_abs_diff']:.4f}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,257 @@
+"""
+Headless GeoShield API and command-line interface.
+
+Import this module for capture, archive index and inference functions without
+pulling in Streamlit, or run it to process coordinates in bulk:
+
+    python geoshield.py capture targets.csv --predict > results.jsonl
+    python geoshield.py predict satellite_images/sat_*.png
+    python geoshield.py index --backfill --near 31.29 75.59
+    python geoshield.py watch add kedarnath 30.7346 79.0669
+    python geoshield.py watch refresh
+    python geoshield.py heatmap define uttarakhand 29.5 78.5 30.5 79.5 --tile-km 5
+    python geoshield.py heatmap update
+
+Targets are read from CSV (lat,lon[,size_km] with or without a header) or
+JSONL ({"lat": ..., "lon": ..., "size_km": ...}); use '-' for stdin. Each
+result is written to stdout as one JSON line as soon as it completes.
+"""
+import argparse
+import csv
+import json
+import sys
+from functools import partial
+from itertools import chain, islice
+
+import metrics
+from band_store import load_bands
+from capture import (find_recent_capture, get_band_capture, get_current_location, get_satellite_image,
+                     resolve_latest_scene)
+from capture_engine import MAX_WORKERS, capture_many
+from capture_index import add_capture, backfill, nearest, query_bbox
+from grid_scan import assemble_mosaic, make_grid, region_bounds, scan_region
+from imagery_backend import EarthEngineBackend, FakeBackend, get_imagery_backend, set_imagery_backend
+from landslide_model import BACKENDS, predict_landslide, predict_tiled, set_backend, warm_up
+from prediction_cache import cached_predict_landslide
+from risk_heatmap import define_region, delete_region, list_regions, update_region
+from watchlist import add_site, list_sites, refresh, remove_site
+
+__all__ = [
+    'get_satellite_image', 'get_band_capture', 'load_bands', 'resolve_latest_scene', 'find_recent_capture',
+    'get_current_location',
+    'capture_many', 'make_grid', 'region_bounds', 'scan_region', 'assemble_mosaic',
+    'add_capture', 'backfill', 'nearest', 'query_bbox',
+    'add_site', 'remove_site', 'list_sites', 'refresh',
+    'define_region', 'delete_region', 'list_regions', 'update_region',
+    'EarthEngineBackend', 'FakeBackend', 'get_imagery_backend', 'set_imagery_backend',
+    'predict_landslide', 'predict_tiled', 'cached_predict_landslide', 'set_backend', 'warm_up',
+]
+
+# Targets are captured in chunks so huge input files never sit in memory at once
+CHUNK_SIZE = 500
+
+
+def read_targets(stream):
+    """Yield (lat, lon, size_km) from a CSV or JSONL stream."""
+    first = stream.readline()
+    if not first:
+        return
+    if first.lstrip().startswith('{'):
+        for line in chain([first], stream):
+            if line.strip():
+                row = json.loads(line)
+                yield float(row['lat']), float(row['lon']), float(row.get('size_km', 5))
+        return
+
+    # Skip a header row such as "lat,lon"
+    try:
+        float(next(csv.reader([first]))[0])
+        rows = csv.reader(chain([first], stream))
+    except (ValueError, IndexError):
+        rows = csv.reader(stream)
+    for row in rows:
+        if not row or not row[0].strip():
+            continue
+        yield float(row[0]), float(row[1]), float(row[2]) if len(row) > 2 and row[2].strip() else 5.0
+
+
+def _emit(record):
+    sys.stdout.write(json.dumps(record, default=str) + '\n')
+    sys.stdout.flush()
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run_capture(args):
+    stream = sys.stdin if args.targets == '-' else open(args.targets, newline='')
+    failures = 0
+    try:
+        for chunk in _chunks(read_targets(stream), CHUNK_SIZE):
+            # capture_many takes (lat, lon); group the chunk by tile size
+            for size_km in sorted({t[2] for t in chunk}):
+                targets = [(lat, lon) for lat, lon, size in chunk if size == size_km]
+
+                def on_result(done, total, result, size_km=size_km):
+                    nonlocal failures
+                    result['size_km'] = size_km
+                    if result['filename'] and args.predict:
+                        try:
+                            prediction = cached_predict_landslide(result['filename'], backend=args.backend)
+                            result['risk_score'] = prediction['risk_score']
+                        except Exception as e:
+                            result['error'] = f"Prediction failed: {e}"
+                    failures += 1 if result['error'] else 0
+                    _emit(result)
+
+                capture_fn = get_band_capture if args.bands else get_satellite_image
+                capture_many(targets, partial(capture_fn, size_km=size_km),
+                             max_workers=args.workers, on_progress=on_result)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    return 1 if failures else 0
+
+
+def run_predict(args):
+    failures = 0
+    for path in args.images:
+        try:
+            prediction = cached_predict_landslide(path, backend=args.backend)
+            _emit({'filename': path, 'risk_score': prediction['risk_score'], 'error': None})
+        except Exception as e:
+            failures += 1
+            _emit({'filename': path, 'risk_score': None, 'error': str(e)})
+    return 1 if failures else 0
+
+
+def run_index(args):
+    if args.backfill:
+        _emit({'backfilled': backfill()})
+    if args.near:
+        for row in nearest(args.near[0], args.near[1], k=args.k):
+            _emit(row)
+    if args.bbox:
+        south, west, north, east = args.bbox
+        for row in query_bbox(south, west, north, east):
+            _emit(row)
+    return 0
+
+
+def run_watch(args):
+    if args.action == 'add':
+        add_site(args.name, args.lat, args.lon, args.size_km)
+    elif args.action == 'remove':
+        if not remove_site(args.name):
+            print(f"No watched site named {args.name!r}", file=sys.stderr)
+            return 1
+    elif args.action == 'list':
+        for site in list_sites():
+            _emit(site)
+    else:
+        failures = 0
+        for result in refresh(predict=not args.no_predict, names=args.names or None, max_workers=args.workers,
+                              backend=args.backend):
+            failures += 1 if result['error'] else 0
+            _emit(result)
+        return 1 if failures else 0
+    return 0
+
+
+def run_heatmap(args):
+    if args.action == 'define':
+        define_region(args.name, args.south, args.west, args.north, args.east, args.tile_km)
+    elif args.action == 'delete':
+        delete_region(args.name)
+    elif args.action == 'list':
+        for region in list_regions():
+            _emit(region)
+    else:
+        failures = 0
+        for name in args.names or [region['name'] for region in list_regions()]:
+            summary = update_region(name, max_workers=args.workers, backend=args.backend)
+            failures += len(summary['failed'])
+            _emit(summary)
+        return 1 if failures else 0
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless GeoShield capture, index and inference.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    capture_parser = commands.add_parser('capture', help="capture every target in a CSV/JSONL file")
+    capture_parser.add_argument('targets', help="CSV or JSONL file of coordinates, or '-' for stdin")
+    capture_parser.add_argument('--workers', type=int, default=MAX_WORKERS)
+    capture_parser.add_argument('--predict', action='store_true', help="also score each capture")
+    capture_parser.add_argument('--bands', action='store_true',
+                                help="download raw bands, NDVI and cloud mask as .npy instead of a PNG")
+    capture_parser.add_argument('--backend', choices=BACKENDS)
+    capture_parser.set_defaults(func=run_capture)
+
+    predict_parser = commands.add_parser('predict', help="score existing capture files")
+    predict_parser.add_argument('images', nargs='+')
+    predict_parser.add_argument('--backend', choices=BACKENDS)
+    predict_parser.set_defaults(func=run_predict)
+
+    index_parser = commands.add_parser('index', help="query the capture archive index")
+    index_parser.add_argument('--backfill', action='store_true')
+    index_parser.add_argument('--near', type=float, nargs=2, metavar=('LAT', 'LON'))
+    index_parser.add_argument('-k', type=int, default=5)
+    index_parser.add_argument('--bbox', type=float, nargs=4, metavar=('SOUTH', 'WEST', 'NORTH', 'EAST'))
+    index_parser.set_defaults(func=run_index)
+
+    watch_parser = commands.add_parser('watch', help="manage and refresh the watchlist of monitored sites")
+    watch_parser.set_defaults(func=run_watch)
+    actions = watch_parser.add_subparsers(dest='action', required=True)
+    add_parser = actions.add_parser('add', help="watch a site (replaces a site with the same name)")
+    add_parser.add_argument('name')
+    add_parser.add_argument('lat', type=float)
+    add_parser.add_argument('lon', type=float)
+    add_parser.add_argument('--size-km', type=float, default=5.0)
+    remove_parser = actions.add_parser('remove', help="stop watching a site")
+    remove_parser.add_argument('name')
+    actions.add_parser('list', help="list watched sites and their last processed scene")
+    refresh_parser = actions.add_parser('refresh', help="capture and score sites with newly acquired scenes")
+    refresh_parser.add_argument('names', nargs='*', help="only refresh these sites")
+    refresh_parser.add_argument('--no-predict', action='store_true', help="capture without scoring")
+    refresh_parser.add_argument('--workers', type=int, default=MAX_WORKERS)
+    refresh_parser.add_argument('--backend', choices=BACKENDS)
+
+    heatmap_parser = commands.add_parser('heatmap', help="maintain precomputed regional risk heatmaps")
+    heatmap_parser.set_defaults(func=run_heatmap)
+    heatmap_actions = heatmap_parser.add_subparsers(dest='action', required=True)
+    define_parser = heatmap_actions.add_parser('define', help="add or redefine a region (discards its tiles)")
+    define_parser.add_argument('name')
+    for edge in ('south', 'west', 'north', 'east'):
+        define_parser.add_argument(edge, type=float)
+    define_parser.add_argument('--tile-km', type=float, default=5.0)
+    delete_parser = heatmap_actions.add_parser('delete', help="remove a region and its tiles")
+    delete_parser.add_argument('name')
+    heatmap_actions.add_parser('list', help="list heatmap regions")
+    update_parser = heatmap_actions.add_parser('update', help="recompute cells with new scenes and their tiles")
+    update_parser.add_argument('names', nargs='*', help="only update these regions")
+    update_parser.add_argument('--workers', type=int, default=MAX_WORKERS)
+    update_parser.add_argument('--backend', choices=BACKENDS)
+
+    for sub in (capture_parser, predict_parser, refresh_parser, update_parser):
+        sub.add_argument('--metrics-port', type=int, default=metrics.METRICS_PORT,
+                         help="serve Prometheus metrics on this local port while running")
+        sub.add_argument('--profile-slow', type=float, metavar='SECONDS', default=metrics.PROFILE_SLOW_SECONDS,
+                         help=f"dump cProfile output for requests slower than this into {metrics.PROFILE_DIR}")
+
+    args = parser.parse_args(argv)
+    if args.command in ('capture', 'predict') or getattr(args, 'action', None) in ('refresh', 'update'):
+        metrics.start_metrics_server(args.metrics_port)
+        metrics.set_profiling(args.profile_slow)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
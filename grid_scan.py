@@ -0,0 +1,97 @@
+import math
+
+from capture_engine import capture_many
+
+KM_PER_DEG_LAT = 111.32
+MAX_SCAN_TILES = 400
+MOSAIC_CELL_PX = 512
+
+
+def region_bounds(lat, lon, size_km):
+    """Return [west, south, east, north] of a size_km square centred on (lat, lon)."""
+    half_lat = size_km / KM_PER_DEG_LAT / 2
+    # Degrees of longitude shrink with cos(latitude); clamp near the poles
+    half_lon = size_km / (KM_PER_DEG_LAT * max(math.cos(math.radians(lat)), 0.01)) / 2
+    return [lon - half_lon, lat - half_lat, lon + half_lon, lat + half_lat]
+
+
+def make_grid(south, west, north, east, tile_km=5):
+    """
+    Tile a bounding box into size_km squares. Each row uses the longitude
+    spacing of its own centre latitude, so tiles stay square on the ground.
+    """
+    if south >= north or west >= east:
+        raise ValueError("Bounding box must have south < north and west < east")
+
+    dlat = tile_km / KM_PER_DEG_LAT
+    n_rows = math.ceil((north - south) / dlat)
+    tiles = []
+    for row in range(n_rows):
+        lat = south + (row + 0.5) * dlat
+        dlon = tile_km / (KM_PER_DEG_LAT * max(math.cos(math.radians(lat)), 0.01))
+        n_cols = math.ceil((east - west) / dlon)
+        for col in range(n_cols):
+            lon = west + (col + 0.5) * dlon
+            tiles.append({
+                'row': row,
+                'col': col,
+                'lat': lat,
+                'lon': lon,
+                'bounds': region_bounds(lat, lon, tile_km),
+            })
+            if len(tiles) > MAX_SCAN_TILES:
+                raise ValueError(
+                    f"Region needs more than {MAX_SCAN_TILES} tiles; use a larger tile size"
+                )
+    return tiles
+
+
+def scan_region(tiles, capture_fn, lookup_fn=None, on_progress=None, **engine_kwargs):
+    """
+    Capture every tile of a grid as one batched job.
+
+    lookup_fn(lat, lon) returns (filename, image_date) for tiles that are
+    already cached, which are reused without touching Earth Engine. The rest
+    are sent to capture_many. Returns one result dict per tile, in tile order.
+    """
+    results = [None] * len(tiles)
+    to_fetch = []
+    for i, tile in enumerate(tiles):
+        filename, image_date = lookup_fn(tile['lat'], tile['lon']) if lookup_fn else (None, None)
+        if filename:
+            results[i] = {'lat': tile['lat'], 'lon': tile['lon'], 'filename': filename,
+                          'error': None, 'image_date': image_date, 'attempts': 0}
+        else:
+            to_fetch.append(i)
+
+    skipped = len(tiles) - len(to_fetch)
+    if on_progress:
+        progress = lambda done, total, result: on_progress(skipped + done, len(tiles), result)
+    else:
+        progress = None
+
+    fetched = capture_many([(tiles[i]['lat'], tiles[i]['lon']) for i in to_fetch],
+                           capture_fn, on_progress=progress, **engine_kwargs)
+    for i, result in zip(to_fetch, fetched):
+        results[i] = result
+    return results
+
+
+def assemble_mosaic(tiles, results, out_path, cell_px=MOSAIC_CELL_PX):
+    """
+    Paste the captured tiles into a single mosaic image, north at the top.
+    Missing tiles are left black. Returns out_path.
+    """
+    from PIL import Image
+
+    n_rows = max(t['row'] for t in tiles) + 1
+    n_cols = max(t['col'] for t in tiles) + 1
+    mosaic = Image.new('RGB', (n_cols * cell_px, n_rows * cell_px))
+    for tile, result in zip(tiles, results):
+        if not result or not result['filename']:
+            continue
+        with Image.open(result['filename']) as img:
+            cell = img.convert('RGB').resize((cell_px, cell_px))
+        mosaic.paste(cell, (tile['col'] * cell_px, (n_rows - 1 - tile['row']) * cell_px))
+    mosaic.save(out_path)
+    return out_path
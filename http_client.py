@@ -0,0 +1,66 @@
+import hashlib
+import os
+import tempfile
+import threading
+
+import metrics
+
+# Seconds to wait for the connection and for each chunk of the response
+HTTP_TIMEOUT = (10, 120)
+POOL_SIZE = 16
+DOWNLOAD_CHUNK_BYTES = 1024 * 1024
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_http_session():
+    """Return the process-wide pooled HTTP session shared by all captures."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+    return _session
+
+
+def download_file(url, dest, expected_type='image/png', chunk_size=DOWNLOAD_CHUNK_BYTES):
+    """
+    Stream url into dest and return the SHA-256 hex digest of its contents.
+
+    The body is written in chunks to a temporary file in the destination
+    directory and renamed into place only once complete, so a failed or
+    interrupted download never leaves a partial file behind. Non-2xx
+    responses and unexpected content types (e.g. Earth Engine error pages)
+    raise instead of being saved.
+    """
+    digest = hashlib.sha256()
+    with get_http_session().get(url, stream=True, timeout=HTTP_TIMEOUT) as response:
+        response.raise_for_status()
+        content_type = response.headers.get('Content-Type', '')
+        if expected_type and not content_type.startswith(expected_type):
+            raise ValueError(f"Unexpected content type {content_type!r} from {response.url}")
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dest) or '.', suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    f.write(chunk)
+                    digest.update(chunk)
+                    metrics.inc('geoshield_download_bytes_total', len(chunk))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, dest)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+    return digest.hexdigest()
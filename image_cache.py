@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+from raster_store import cog_path_for
+
+# Cached captures live next to the archive so they share a filesystem
+# (cache entries are hard links to the captured files where possible).
+CACHE_DIR = os.path.join("satellite_images", "cache")
+CACHE_DB = os.path.join(CACHE_DIR, "index.sqlite")
+CACHE_MAX_BYTES = 2 * 1024 ** 3
+CACHE_MAX_AGE_SECONDS = 30 * 24 * 3600
+
+_lock = threading.Lock()
+
+
+def _connect():
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    conn = sqlite3.connect(CACHE_DB, timeout=30)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY,
+            scene_id TEXT NOT NULL,
+            path TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            image_date TEXT,
+            created REAL NOT NULL,
+            last_access REAL NOT NULL
+        )
+    """)
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(entries)")]
+    for column in ('region', 'sha256'):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE entries ADD COLUMN {column} TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS entries_region ON entries (region, created)")
+    return conn
+
+
+def region_key(region_coords, dimensions, vis_params):
+    """Build the scene-independent key for a region rendered with given parameters."""
+    payload = json.dumps({
+        'region': [round(c, 6) for c in region_coords],
+        'dimensions': str(dimensions),
+        'vis': vis_params,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def cache_key(scene_id, region_coords, dimensions, vis_params):
+    """Build the cache key for a rendered scene."""
+    payload = json.dumps({
+        'scene': scene_id,
+        'region': region_key(region_coords, dimensions, vis_params),
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def lookup(key):
+    """Return (path, image_date) for a cached capture, or (None, None) on a miss."""
+    now = time.time()
+    with _lock:
+        conn = _connect()
+        try:
+            row = conn.execute(
+                "SELECT path, image_date, created FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None, None
+            path, image_date, created = row
+            if now - created > CACHE_MAX_AGE_SECONDS or not os.path.exists(path):
+                _remove(conn, key, path)
+                conn.commit()
+                return None, None
+            conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+            conn.commit()
+            return path, image_date
+        finally:
+            conn.close()
+
+
+def find_recent(region, max_age_seconds):
+    """
+    Return (path, image_date) of the newest capture of a region (see region_key)
+    made within max_age_seconds, without resolving the current scene.
+    """
+    cutoff = time.time() - max_age_seconds
+    with _lock:
+        conn = _connect()
+        try:
+            row = conn.execute(
+                "SELECT path, image_date FROM entries WHERE region = ? AND created >= ? "
+                "ORDER BY created DESC LIMIT 1", (region, cutoff)
+            ).fetchone()
+        finally:
+            conn.close()
+    if row is None or not os.path.exists(row[0]):
+        return None, None
+    return row
+
+
+def store(key, scene_id, src_path, image_date=None, region=None, sha256=None):
+    """Add a freshly captured file to the cache and return the cached path."""
+    dest = os.path.join(CACHE_DIR, key + os.path.splitext(src_path)[1])
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    if os.path.exists(dest):
+        os.remove(dest)
+    try:
+        os.link(src_path, dest)
+    except OSError:
+        shutil.copyfile(src_path, dest)
+
+    now = time.time()
+    with _lock:
+        conn = _connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries "
+                "(key, scene_id, path, size, image_date, created, last_access, region, sha256) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, scene_id, dest, os.path.getsize(dest), image_date, now, now, region, sha256)
+            )
+            conn.commit()
+            _evict(conn)
+        finally:
+            conn.close()
+    return dest
+
+
+def update_file(path, size, sha256):
+    """Record new size and hash for entries whose file was re-encoded in place."""
+    with _lock:
+        conn = _connect()
+        try:
+            conn.execute("UPDATE entries SET size = ?, sha256 = ? WHERE path = ?", (size, sha256, path))
+            conn.commit()
+        finally:
+            conn.close()
+
+
+def evict(max_bytes=None, max_age_seconds=None):
+    """Drop expired entries, then least recently used ones until under the size budget."""
+    with _lock:
+        conn = _connect()
+        try:
+            _evict(conn, max_bytes, max_age_seconds)
+        finally:
+            conn.close()
+
+
+def _evict(conn, max_bytes=None, max_age_seconds=None):
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    max_age_seconds = CACHE_MAX_AGE_SECONDS if max_age_seconds is None else max_age_seconds
+
+    cutoff = time.time() - max_age_seconds
+    for key, path in conn.execute(
+        "SELECT key, path FROM entries WHERE created < ?", (cutoff,)
+    ).fetchall():
+        _remove(conn, key, path)
+
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+    if total > max_bytes:
+        for key, path, size in conn.execute(
+            "SELECT key, path, size FROM entries ORDER BY last_access"
+        ).fetchall():
+            if total <= max_bytes:
+                break
+            _remove(conn, key, path)
+            total -= size
+    conn.commit()
+
+
+def _remove(conn, key, path):
+    # The entry's COG sidecar (see capture) goes with it
+    conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+    for file_path in (path, cog_path_for(path)):
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
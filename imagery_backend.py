@@ -0,0 +1,268 @@
+import glob
+import hashlib
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+import numpy as np
+
+import metrics
+from band_store import (BAND_ORDER, CLOUD_SCL_CLASSES, NDVI_SCALE, RGB_VIS_PARAMS, SPECTRAL_BANDS,
+                        band_index, pixel_grid, save_bands)
+from capture_index import parse_capture_filename
+from earth_engine import get_ee
+from http_client import download_file
+
+# Selects the default backend: 'earthengine', or 'fake' to serve local PNGs
+IMAGERY_BACKEND = os.environ.get('GEOSHIELD_IMAGERY_BACKEND', 'earthengine')
+FAKE_SOURCE_DIR = os.environ.get('GEOSHIELD_FAKE_SOURCE_DIR', 'satellite_images')
+# Earliest acquisition considered when a region has no previously processed scene
+SCENE_SEARCH_START = '2024-01-01'
+# Regions resolved per Earth Engine call by resolve_latest_scenes
+RESOLVE_BATCH_SIZE = 100
+
+
+class ImageryBackend(ABC):
+    """
+    Source of satellite scenes for get_satellite_image.
+
+    resolve_latest_scene returns a dict with at least scene_id, date and time
+    (acquisition, in milliseconds since the epoch), or None if no clear scene
+    covers the region; with since (milliseconds) only scenes acquired after
+    it count. fetch_thumbnail renders the scene over the region into dest and
+    returns the SHA-256 of the file; fetch_bands does the same for the raw
+    bands as an HxWxC int16 .npy laid out as band_store.BAND_ORDER.
+    """
+
+    @abstractmethod
+    def resolve_latest_scene(self, region_coords, since=None):
+        ...
+
+    def resolve_latest_scenes(self, requests):
+        """
+        Resolve many (region_coords, since) pairs; returns a scene dict or None
+        for each. Backends override this to answer in as few calls as possible.
+        """
+        return [self.resolve_latest_scene(region_coords, since) for region_coords, since in requests]
+
+    @abstractmethod
+    def fetch_thumbnail(self, scene, region_coords, dimensions, vis_params, dest):
+        ...
+
+    @abstractmethod
+    def fetch_bands(self, scene, region_coords, scale, dest):
+        ...
+
+
+class EarthEngineBackend(ImageryBackend):
+    """Sentinel-2 surface reflectance scenes from Google Earth Engine."""
+
+    collection_id = 'COPERNICUS/S2_SR'
+
+    def _latest_scene(self, ee, region_coords, since):
+        region = ee.Geometry.Rectangle(region_coords)
+        start = ee.Date(since + 1) if since is not None else ee.Date(SCENE_SEARCH_START)
+        # End is exclusive, so run to tomorrow to include today's acquisitions
+        end = ee.Date(datetime.now().strftime('%Y-%m-%d')).advance(1, 'day')
+        collection = (ee.ImageCollection(self.collection_id)
+                      .filterBounds(region)
+                      .filterDate(start, end)
+                      .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20))
+                      .sort('system:time_start', False))
+        image = ee.Image(collection.first())
+        return ee.Dictionary(ee.Algorithms.If(
+            collection.size().gt(0),
+            ee.Dictionary({
+                'found': True,
+                'scene_id': image.get('system:index'),
+                'date': ee.Date(image.get('system:time_start')).format('YYYY-MM-dd'),
+                'time': image.get('system:time_start'),
+                'cloud_percentage': image.get('CLOUDY_PIXEL_PERCENTAGE')
+            }),
+            ee.Dictionary({'found': False})
+        ))
+
+    def resolve_latest_scene(self, region_coords, since=None):
+        """
+        Resolve the most recent clear Sentinel-2 scene over a region in a single
+        Earth Engine call. Returns a dict with scene_id, date, time and
+        cloud_percentage, or None if the collection is empty.
+        """
+        info = self._latest_scene(get_ee(), region_coords, since).getInfo()
+        return info if info.get('found') else None
+
+    def resolve_latest_scenes(self, requests):
+        """Resolve up to RESOLVE_BATCH_SIZE regions per getInfo round trip."""
+        ee = get_ee()
+        requests = list(requests)
+        scenes = []
+        for i in range(0, len(requests), RESOLVE_BATCH_SIZE):
+            chunk = requests[i:i + RESOLVE_BATCH_SIZE]
+            infos = ee.List([self._latest_scene(ee, region_coords, since) for region_coords, since in chunk]).getInfo()
+            scenes.extend(info if info.get('found') else None for info in infos)
+        return scenes
+
+    def fetch_thumbnail(self, scene, region_coords, dimensions, vis_params, dest):
+        ee = get_ee()
+        image = ee.Image(f"{self.collection_id}/{scene['scene_id']}")
+        with metrics.span('ee_thumb_url'):
+            url = image.getThumbURL({
+                'region': ee.Geometry.Rectangle(region_coords),
+                'dimensions': dimensions,
+                'format': 'png',
+                **vis_params
+            })
+        with metrics.span('download'):
+            return download_file(url, dest)
+
+    def fetch_bands(self, scene, region_coords, scale, dest):
+        """
+        Download the scene's raw bands at scale metres per pixel. Band
+        selection, the SCL cloud mask and NDVI are computed by Earth Engine
+        and everything is cast to int16 before transfer, so only the needed
+        bands cross the wire and nothing is rendered or re-encoded.
+        """
+        ee = get_ee()
+        image = ee.Image(f"{self.collection_id}/{scene['scene_id']}")
+        clear = image.select('SCL').remap(list(CLOUD_SCL_CLASSES), [0] * len(CLOUD_SCL_CLASSES), 1).rename('CLEAR')
+        ndvi = image.normalizedDifference(['B8', 'B4']).multiply(NDVI_SCALE).rename('NDVI')
+        stack = image.select(list(SPECTRAL_BANDS)).addBands(ndvi).addBands(clear).toInt16()
+
+        west, south, east, north = region_coords
+        width, height = pixel_grid(region_coords, scale)
+        with metrics.span('ee_compute_pixels'):
+            pixels = ee.data.computePixels({
+                'expression': stack,
+                'fileFormat': 'NUMPY_NDARRAY',
+                'bandIds': list(BAND_ORDER),
+                'grid': {
+                    'dimensions': {'width': width, 'height': height},
+                    'affineTransform': {
+                        'scaleX': (east - west) / width, 'shearX': 0, 'translateX': west,
+                        'shearY': 0, 'scaleY': -(north - south) / height, 'translateY': north,
+                    },
+                    'crsCode': 'EPSG:4326',
+                },
+            })
+        # The structured array has one field per band; store it channels-last
+        with metrics.span('write_bands'):
+            return save_bands(np.stack([pixels[name] for name in BAND_ORDER], axis=-1), dest)
+
+
+class FakeBackend(ImageryBackend):
+    """
+    Offline stand-in that serves the PNGs already in satellite_images/.
+
+    Each region maps deterministically to one sample image, which acts as
+    its "latest scene". latency (seconds, per call) and failure_rate /
+    quota_error_rate (probabilities per call) simulate a slow or flaky
+    upstream; quota errors use Earth Engine's wording so retries kick in.
+    """
+
+    def __init__(self, source_dir=FAKE_SOURCE_DIR, latency=0.0, failure_rate=0.0,
+                 quota_error_rate=0.0, empty_rate=0.0, seed=None):
+        self.samples = sorted(glob.glob(os.path.join(source_dir, 'sat_*.png')))
+        if not self.samples:
+            raise ValueError(f"No sample captures found in {source_dir}")
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.quota_error_rate = quota_error_rate
+        self.empty_rate = empty_rate
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self.calls = {'resolve': 0, 'fetch': 0}
+
+    def _simulate(self, call):
+        with self._random_lock:
+            self.calls[call] += 1
+            roll = self._random.random()
+        if self.latency:
+            time.sleep(self.latency)
+        if roll < self.quota_error_rate:
+            raise RuntimeError("Earth Engine capacity exceeded: Too many concurrent aggregations (quota)")
+        if roll < self.quota_error_rate + self.failure_rate:
+            raise RuntimeError(f"Injected {call} failure")
+
+    def _sample_for(self, region_coords):
+        digest = hashlib.sha256(repr([round(c, 6) for c in region_coords]).encode('utf-8')).digest()
+        return self.samples[int.from_bytes(digest[:8], 'big') % len(self.samples)], digest
+
+    def _scene_for(self, region_coords, since):
+        sample, digest = self._sample_for(region_coords)
+        if digest[8] / 256 < self.empty_rate:
+            return None
+        # The sample's capture time stands in for the acquisition time
+        parsed = parse_capture_filename(sample)
+        acquired = parsed[2] if parsed else datetime.fromtimestamp(os.path.getmtime(sample))
+        acquired_ms = int(acquired.timestamp() * 1000)
+        if since is not None and acquired_ms <= since:
+            return None
+        return {
+            'scene_id': f"FAKE_{os.path.splitext(os.path.basename(sample))[0]}",
+            'date': acquired.strftime('%Y-%m-%d'),
+            'time': acquired_ms,
+            'cloud_percentage': 0.0,
+            'sample': sample,
+        }
+
+    def resolve_latest_scene(self, region_coords, since=None):
+        self._simulate('resolve')
+        return self._scene_for(region_coords, since)
+
+    def resolve_latest_scenes(self, requests):
+        self._simulate('resolve')
+        return [self._scene_for(region_coords, since) for region_coords, since in requests]
+
+    def fetch_thumbnail(self, scene, region_coords, dimensions, vis_params, dest):
+        self._simulate('fetch')
+        digest = hashlib.sha256()
+        tmp_path = f"{dest}.{os.getpid()}.{threading.get_ident()}.part"
+        with open(scene['sample'], 'rb') as src, open(tmp_path, 'wb') as dst:
+            for chunk in iter(lambda: src.read(1024 * 1024), b''):
+                dst.write(chunk)
+                digest.update(chunk)
+        os.replace(tmp_path, dest)
+        return digest.hexdigest()
+
+    def fetch_bands(self, scene, region_coords, scale, dest):
+        # Synthesize plausible bands from the sample's RGB by inverting the display stretch
+        from PIL import Image
+
+        self._simulate('fetch')
+        with Image.open(scene['sample']) as img:
+            rgb = np.asarray(img.convert('RGB').resize(pixel_grid(region_coords, scale)), dtype=np.float32) / 255.0
+        vis = RGB_VIS_PARAMS
+        dn = rgb ** vis['gamma'] * (vis['max'] - vis['min']) + vis['min']
+        red, green, blue = dn[..., 0], dn[..., 1], dn[..., 2]
+        bands = np.zeros(rgb.shape[:2] + (len(BAND_ORDER),), dtype=np.float32)
+        bands[..., band_index('B4')], bands[..., band_index('B3')], bands[..., band_index('B2')] = red, green, blue
+        bands[..., band_index('B8')] = np.clip(2.5 * green - 1.2 * red, 0, None) + 300
+        bands[..., band_index('B11')] = 0.8 * red + 0.4 * green
+        bands[..., band_index('B12')] = 0.6 * red + 0.2 * green
+        nir = bands[..., band_index('B8')]
+        bands[..., band_index('NDVI')] = (nir - red) / np.maximum(nir + red, 1) * NDVI_SCALE
+        bands[..., band_index('CLEAR')] = 1
+        return save_bands(np.round(bands), dest)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_imagery_backend():
+    """Return the process-wide imagery backend, created from IMAGERY_BACKEND on first use."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = FakeBackend() if IMAGERY_BACKEND == 'fake' else EarthEngineBackend()
+    return _backend
+
+
+def set_imagery_backend(backend):
+    """Replace the imagery backend used by get_satellite_image, e.g. with a FakeBackend."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
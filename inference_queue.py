@@ -0,0 +1,151 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from functools import partial
+
+import numpy as np
+
+import landslide_model
+from landslide_model import predict_patches
+
+MAX_BATCH_SIZE = 16
+MAX_WAIT_SECONDS = 0.02
+# Number of recent requests kept for latency percentiles
+METRICS_WINDOW = 1000
+
+
+class _Request:
+    def __init__(self, patches):
+        self.patches = patches
+        self.results = [None] * len(patches)
+        self.remaining = len(patches)
+        self.future = Future()
+        self.submitted = time.monotonic()
+
+
+class InferenceQueue:
+    """
+    Dynamic batching queue in front of the U-Net.
+
+    Concurrent callers submit patch batches; a single worker thread merges
+    patches from all pending requests into batches of up to max_batch_size,
+    waiting at most max_wait seconds for a batch to fill, and routes each
+    prediction back to its caller.
+    """
+
+    def __init__(self, predict_fn=predict_patches, max_batch_size=MAX_BATCH_SIZE,
+                 max_wait=MAX_WAIT_SECONDS):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._metrics_lock = threading.Lock()
+        self._latencies = deque(maxlen=METRICS_WINDOW)
+        self._batch_fills = deque(maxlen=METRICS_WINDOW)
+        self._requests = 0
+        self._batches = 0
+        self._patches = 0
+        self._worker = threading.Thread(target=self._run, name='inference-queue', daemon=True)
+        self._worker.start()
+
+    def submit(self, patches):
+        """Queue an NxHxWxC patch array and return a Future of NxHxW probabilities."""
+        request = _Request(patches)
+        if not len(patches):
+            request.future.set_result(np.zeros((0,) + patches.shape[1:3], dtype=np.float32))
+            return request.future
+        for i in range(len(patches)):
+            self._queue.put((request, i))
+        return request.future
+
+    def predict(self, patches):
+        """Blocking form of submit, usable as predict_fn for predict_tiled."""
+        return self.submit(patches).result()
+
+    def _next_batch(self):
+        items = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(items) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                items.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return items
+
+    def _run(self):
+        while True:
+            items = self._next_batch()
+            try:
+                probabilities = self.predict_fn(
+                    np.stack([request.patches[i] for request, i in items])
+                )
+            except Exception as e:
+                for request, _ in items:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                continue
+
+            finished = []
+            for (request, i), probability in zip(items, probabilities):
+                if request.future.done():
+                    continue
+                request.results[i] = probability
+                request.remaining -= 1
+                if request.remaining == 0:
+                    request.future.set_result(np.stack(request.results))
+                    finished.append(time.monotonic() - request.submitted)
+
+            with self._metrics_lock:
+                self._batches += 1
+                self._patches += len(items)
+                self._batch_fills.append(len(items) / self.max_batch_size)
+                self._requests += len(finished)
+                self._latencies.extend(finished)
+
+    def stats(self):
+        """Return request latency and batch-fill metrics over the recent window."""
+        with self._metrics_lock:
+            latencies = sorted(self._latencies)
+            fills = list(self._batch_fills)
+            stats = {
+                'requests': self._requests,
+                'batches': self._batches,
+                'patches': self._patches,
+                'queued_patches': self._queue.qsize(),
+            }
+        if latencies:
+            stats['latency_p50'] = latencies[len(latencies) // 2]
+            stats['latency_p95'] = latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)]
+            stats['latency_max'] = latencies[-1]
+        if fills:
+            stats['mean_batch_fill'] = sum(fills) / len(fills)
+        return stats
+
+
+_inference_queues = {}
+_inference_queue_lock = threading.Lock()
+
+
+def get_inference_queue(backend=None):
+    """
+    Return the process-wide inference queue for a backend (BACKEND by
+    default), starting it on first use. Each backend has its own queue, so
+    patches are never batched onto a model other than the one requested.
+    """
+    backend = backend or landslide_model.BACKEND
+    with _inference_queue_lock:
+        if backend not in _inference_queues:
+            _inference_queues[backend] = InferenceQueue(partial(predict_patches, backend=backend))
+    return _inference_queues[backend]
+
+
+def queue_stats():
+    """Return stats() of every started queue, by backend."""
+    with _inference_queue_lock:
+        queues = dict(_inference_queues)
+    return {backend: q.stats() for backend, q in queues.items()}
@@ -0,0 +1,265 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import metrics
+
+JOB_DB = os.path.join("satellite_images", "jobs.sqlite")
+JOB_WORKERS = 4
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+_executor = None
+_executor_lock = threading.Lock()
+_db_lock = threading.Lock()
+_warm_backends = set()
+_warm_lock = threading.Lock()
+
+
+def _connect():
+    os.makedirs(os.path.dirname(JOB_DB), exist_ok=True)
+    conn = sqlite3.connect(JOB_DB, timeout=30)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            params TEXT NOT NULL,
+            status TEXT NOT NULL,
+            result TEXT,
+            error TEXT,
+            created REAL NOT NULL,
+            started REAL,
+            finished REAL
+        )
+    """)
+    if 'progress' not in [row[1] for row in conn.execute("PRAGMA table_info(jobs)")]:
+        # [done, total] of a running batch, scan, watchlist or heatmap job
+        conn.execute("ALTER TABLE jobs ADD COLUMN progress TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS jobs_created ON jobs (created)")
+    return conn
+
+
+def _execute(sql, args=()):
+    with _db_lock:
+        conn = _connect()
+        try:
+            rows = conn.execute(sql, args).fetchall()
+            conn.commit()
+            return rows
+        finally:
+            conn.close()
+
+
+def _set_progress(job_id, done, total, result=None):
+    # on_progress callback for the long-running handlers
+    _execute("UPDATE jobs SET progress = ? WHERE id = ?", (json.dumps([done, total]), job_id))
+
+
+def _run_capture(params, on_progress):
+    from capture import get_satellite_image
+    from grid_scan import region_bounds
+    from raster_store import cog_for
+
+    filename, error_msg, image_date = get_satellite_image(
+        params['lat'], params['lon'], params.get('size_km', 5)
+    )
+    if error_msg:
+        raise RuntimeError(error_msg)
+    return {
+        'filename': filename,
+        'image_date': image_date,
+        'bounds': region_bounds(params['lat'], params['lon'], params.get('size_km', 5)),
+        # capture writes the COG sidecar when it can; without it readers use the PNG
+        'raster': cog_for(filename),
+    }
+
+
+def _run_batch(params, on_progress):
+    from capture import get_satellite_image
+    from capture_engine import capture_many
+
+    results = capture_many([tuple(target) for target in params['targets']], get_satellite_image,
+                           max_workers=params.get('max_workers', 4), on_progress=on_progress)
+    return {'captures': results}
+
+
+def _run_scan(params, on_progress):
+    from datetime import datetime
+
+    from capture import find_recent_capture, get_satellite_image
+    from grid_scan import assemble_mosaic, make_grid, scan_region
+
+    south, west, north, east = params['south'], params['west'], params['north'], params['east']
+    tile_km = params.get('tile_km', 5)
+    tiles = make_grid(south, west, north, east, tile_km)
+    results = scan_region(
+        tiles,
+        partial(get_satellite_image, size_km=tile_km),
+        lookup_fn=partial(find_recent_capture, size_km=tile_km),
+        max_workers=params.get('max_workers', 4),
+        on_progress=on_progress,
+    )
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    mosaic_path = assemble_mosaic(
+        tiles, results, f"satellite_images/scan_{south:.4f}_{west:.4f}_{north:.4f}_{east:.4f}_{timestamp}.png"
+    )
+    return {
+        'mosaic': mosaic_path,
+        'tiles': len(tiles),
+        'failed': sum(1 for result in results if not result['filename']),
+        'tile_km': tile_km,
+    }
+
+
+def _prepare_backend(backend):
+    # Resolve a job's backend once and warm its model; the backend is then
+    # passed explicitly so concurrent jobs never share a process-wide choice
+    import landslide_model
+    from prediction_cache import purge_stale
+
+    backend = backend or landslide_model.BACKEND
+    with _warm_lock:
+        if backend not in _warm_backends:
+            landslide_model.warm_up(backend)
+            purge_stale()
+            _warm_backends.add(backend)
+    return backend
+
+
+def _run_predict(params, on_progress):
+    from inference_queue import get_inference_queue
+    from landslide_model import OVERLAY_DIR, render_overlay
+    from prediction_cache import cached_predict_landslide
+
+    backend = _prepare_backend(params.get('backend'))
+    result = cached_predict_landslide(params['filename'], predict_fn=get_inference_queue(backend).predict,
+                                      backend=backend)
+    os.makedirs(OVERLAY_DIR, exist_ok=True)
+    overlay_path = os.path.join(
+        OVERLAY_DIR, os.path.splitext(os.path.basename(params['filename']))[0] + "_risk.png"
+    )
+    render_overlay(params['filename'], result['mask'], overlay_path)
+    return {'filename': params['filename'], 'risk_score': result['risk_score'], 'overlay': overlay_path}
+
+
+def _run_watchlist(params, on_progress):
+    from inference_queue import get_inference_queue
+    from watchlist import FAILED as SITE_FAILED, NEW, refresh
+
+    predict = params.get('predict', True)
+    backend = _prepare_backend(params.get('backend')) if predict else None
+    results = refresh(predict=predict, names=params.get('names'),
+                      predict_fn=get_inference_queue(backend).predict if predict else None, backend=backend,
+                      on_progress=on_progress)
+    return {
+        'checked': len(results),
+        'new': [result for result in results if result['status'] == NEW],
+        'failed': [result for result in results if result['status'] == SITE_FAILED],
+    }
+
+
+def _run_heatmap(params, on_progress):
+    from inference_queue import get_inference_queue
+    from risk_heatmap import list_regions, update_region
+
+    backend = _prepare_backend(params.get('backend'))
+    predict_fn = get_inference_queue(backend).predict
+    names = params.get('regions') or [region['name'] for region in list_regions()]
+    return {'regions': [update_region(name, predict_fn=predict_fn, backend=backend, on_progress=on_progress)
+                        for name in names]}
+
+
+# Job kinds and the functions that run them; each takes the job's params
+# dict and an on_progress(done, total, result) callback that records the
+# job's progress, and returns a JSON-serializable result
+HANDLERS = {
+    'capture': _run_capture,
+    'batch': _run_batch,
+    'scan': _run_scan,
+    'predict': _run_predict,
+    'watchlist': _run_watchlist,
+    'heatmap': _run_heatmap,
+}
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='job')
+    return _executor
+
+
+def _run_job(job_id, kind, params):
+    _execute("UPDATE jobs SET status = ?, started = ? WHERE id = ?", (RUNNING, time.time(), job_id))
+    try:
+        with metrics.request(f'job_{kind}', job_id=job_id, params=params):
+            result = HANDLERS[kind](params, partial(_set_progress, job_id))
+    except Exception as e:
+        _execute("UPDATE jobs SET status = ?, error = ?, finished = ? WHERE id = ?",
+                 (FAILED, str(e), time.time(), job_id))
+    else:
+        _execute("UPDATE jobs SET status = ?, result = ?, finished = ? WHERE id = ?",
+                 (DONE, json.dumps(result), time.time(), job_id))
+
+
+def submit_job(kind, params):
+    """Queue a job on the local worker pool and return its ID immediately."""
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind {kind!r}")
+    job_id = uuid.uuid4().hex
+    _execute("INSERT INTO jobs (id, kind, params, status, created) VALUES (?, ?, ?, ?, ?)",
+             (job_id, kind, json.dumps(params), QUEUED, time.time()))
+    _get_executor().submit(_run_job, job_id, kind, params)
+    return job_id
+
+
+def resume_jobs():
+    """
+    Requeue jobs left queued or running by a process that exited. Call once
+    at startup; returns the number of jobs resubmitted.
+    """
+    rows = _execute("SELECT id, kind, params FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING))
+    for job_id, kind, params in rows:
+        _execute("UPDATE jobs SET status = ?, started = NULL, progress = NULL WHERE id = ?", (QUEUED, job_id))
+        _get_executor().submit(_run_job, job_id, kind, json.loads(params))
+    return len(rows)
+
+
+def _job(row):
+    job_id, kind, params, status, result, error, created, started, finished, progress = row
+    return {
+        'id': job_id,
+        'kind': kind,
+        'params': json.loads(params),
+        'status': status,
+        'result': json.loads(result) if result else None,
+        'error': error,
+        'created': created,
+        'started': started,
+        'finished': finished,
+        'progress': json.loads(progress) if progress else None,
+    }
+
+
+def get_job(job_id):
+    """Return a job's current state as a dict, or None if unknown. Never blocks on the job."""
+    rows = _execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+    return _job(rows[0]) if rows else None
+
+
+def recent_jobs(limit=20, kind=None):
+    """Return the most recently submitted jobs from any session, newest first."""
+    if kind:
+        rows = _execute("SELECT * FROM jobs WHERE kind = ? ORDER BY created DESC LIMIT ?", (kind, limit))
+    else:
+        rows = _execute("SELECT * FROM jobs ORDER BY created DESC LIMIT ?", (limit,))
+    return [_job(row) for row in rows]
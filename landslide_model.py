@@ -0,0 +1,246 @@
+import os
+import threading
+from functools import partial
+
+import numpy as np
+
+import metrics
+
+MODEL_PATH = os.environ.get('GEOSHIELD_MODEL_PATH', 'Kitretsu.h5')
+# Exported by export_model.py; point at Kitretsu.int8.onnx for the quantized model
+ONNX_MODEL_PATH = os.environ.get('GEOSHIELD_ONNX_MODEL_PATH', 'Kitretsu.onnx')
+BACKENDS = ('keras', 'onnx')
+BACKEND = os.environ.get('GEOSHIELD_BACKEND', 'keras')
+RISK_THRESHOLD = 0.5
+OVERLAY_DIR = os.path.join("satellite_images", "overlays")
+# Used when the model is fully convolutional and doesn't fix its input size
+DEFAULT_INPUT_SIZE = 256
+# Tiled inference settings; peak memory grows with BATCH_SIZE * patch area
+PATCH_SIZE = int(os.environ.get('GEOSHIELD_PATCH_SIZE', 0)) or None
+PATCH_OVERLAP = int(os.environ.get('GEOSHIELD_PATCH_OVERLAP', 64))
+BATCH_SIZE = int(os.environ.get('GEOSHIELD_BATCH_SIZE', 8))
+
+_model = None
+_model_lock = threading.Lock()
+_onnx_sessions = {}
+
+
+def set_backend(backend):
+    """
+    Switch the default inference backend for this process. Code serving
+    several callers should pass backend explicitly instead.
+    """
+    global BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {BACKENDS}")
+    BACKEND = backend
+
+
+def load_model(path=MODEL_PATH):
+    """Load the Kitretsu U-Net once per process and return it."""
+    global _model
+    with _model_lock:
+        if _model is None:
+            from tensorflow import keras
+            _model = keras.models.load_model(path, compile=False)
+    return _model
+
+
+def load_onnx_session(path=None):
+    """
+    Load an exported ONNX model into a CPU ONNX Runtime session, once per
+    path. path defaults to ONNX_MODEL_PATH as it is at call time.
+    """
+    path = path or ONNX_MODEL_PATH
+    with _model_lock:
+        if path not in _onnx_sessions:
+            import onnxruntime as ort
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            _onnx_sessions[path] = ort.InferenceSession(
+                path, options, providers=['CPUExecutionProvider']
+            )
+    return _onnx_sessions[path]
+
+
+def model_input_shape(backend=None, onnx_path=None):
+    """Return the (height, width, channels) the U-Net expects."""
+    if (backend or BACKEND) == 'onnx':
+        # Dynamic ONNX dimensions are reported as names rather than ints
+        shape = [d if isinstance(d, int) else None
+                 for d in load_onnx_session(onnx_path).get_inputs()[0].shape]
+        _, height, width, channels = shape
+    else:
+        _, height, width, channels = load_model().input_shape
+    return height or DEFAULT_INPUT_SIZE, width or DEFAULT_INPUT_SIZE, channels
+
+
+def warm_up(backend=None):
+    """Run one dummy forward pass so graph tracing isn't paid by the first request."""
+    height, width, channels = model_input_shape(backend)
+    predict_patches(np.zeros((1, height, width, channels), dtype=np.float32), backend)
+
+
+def load_image(image):
+    """Load a capture (file path or HxWx3 uint8 array) as float32 RGB in [0, 1]."""
+    if isinstance(image, (str, os.PathLike)):
+        from PIL import Image
+        with Image.open(image) as img:
+            image = np.asarray(img.convert('RGB'))
+    image = np.asarray(image)
+    if image.dtype == np.uint8:
+        image = image.astype(np.float32) / 255.0
+    return image.astype(np.float32, copy=False)
+
+
+def _probabilities(output):
+    # Sigmoid models emit one channel; softmax models put landslide in channel 1
+    if output.shape[-1] == 1:
+        return output[..., 0]
+    return output[..., 1]
+
+
+def predict_patches(batch, backend=None, onnx_path=None):
+    """
+    Run a batch of NxHxWxC patches through the U-Net and return NxHxW
+    probabilities. onnx_path selects a specific exported model for the onnx
+    backend, e.g. a quantized one under test.
+    """
+    backend = backend or BACKEND
+    with metrics.span(f'inference_batch_{backend}'):
+        if backend == 'onnx':
+            session = load_onnx_session(onnx_path)
+            output = session.run(None, {session.get_inputs()[0].name: batch.astype(np.float32)})[0]
+        else:
+            output = load_model().predict(batch, verbose=0)
+    return _probabilities(output)
+
+
+def _tile_starts(length, patch, stride):
+    starts = list(range(0, max(length - patch, 0) + 1, stride))
+    if starts[-1] + patch < length:
+        starts.append(length - patch)
+    return starts
+
+
+def _blend_window(patch_height, patch_width):
+    # Tapered weights so patch centres dominate and seams fade out; never zero,
+    # so pixels only covered by a patch edge still get a prediction
+    def ramp(n):
+        return np.maximum(np.sin(np.pi * (np.arange(n) + 0.5) / n), 1e-3)
+    return np.outer(ramp(patch_height), ramp(patch_width)).astype(np.float32)
+
+
+def predict_tiled(image, patch_size=PATCH_SIZE, overlap=PATCH_OVERLAP, batch_size=BATCH_SIZE,
+                  predict_fn=None, backend=None):
+    """
+    Predict a full-resolution probability map by sliding the U-Net over
+    overlapping patches and blending them with tapered weights.
+
+    patch_size defaults to the model's input size. Only batch_size patches
+    are held in memory at once, alongside two float32 accumulators the size
+    of the image; GeoTIFF captures (see raster_store), including PNG
+    captures that have a COG sidecar, are read window by window and band
+    captures (see band_store) are memory-mapped rather than
+    decoded whole. backend selects the inference backend for this call
+    (BACKEND by default). predict_fn replaces predict_patches, e.g. to route
+    patches through a shared InferenceQueue; it must serve the same backend.
+    """
+    predict_fn = predict_fn or partial(predict_patches, backend=backend)
+    model_height, model_width, channels = model_input_shape(backend)
+    patch_height, patch_width = (patch_size, patch_size) if patch_size else (model_height, model_width)
+    if overlap >= min(patch_height, patch_width):
+        raise ValueError("overlap must be smaller than the patch size")
+
+    if isinstance(image, (str, os.PathLike)) and str(image).lower().endswith('.png'):
+        # capture writes a COG next to PNG captures; read that instead of
+        # decoding the PNG, but only if it was converted from this very file
+        from raster_store import cog_for
+        image = cog_for(image) or image
+
+    if isinstance(image, (str, os.PathLike)) and str(image).lower().endswith(('.tif', '.tiff')):
+        # GeoTIFF captures are read one patch window at a time; edges are zero-filled
+        from raster_store import WindowedImage
+        source = WindowedImage(image)
+        height, width, image_channels = source.shape
+
+        def read_patch(y, x):
+            return source.read(x, y, patch_width, patch_height).astype(np.float32) / 255.0
+    elif isinstance(image, (str, os.PathLike)) and str(image).lower().endswith('.npy'):
+        # Raw band captures are memory-mapped and stretched to RGB patch by patch
+        from band_store import load_bands, read_rgb
+        source = None
+        bands = load_bands(image)
+        height, width, image_channels = bands.shape[0], bands.shape[1], 3
+
+        def read_patch(y, x):
+            return read_rgb(bands, x, y, patch_width, patch_height)
+    else:
+        source = None
+        pixels = load_image(image)
+        height, width, image_channels = pixels.shape
+        # Captures smaller than one patch are reflect-padded up to it
+        pad_height, pad_width = max(patch_height - height, 0), max(patch_width - width, 0)
+        if pad_height or pad_width:
+            pixels = np.pad(pixels, ((0, pad_height), (0, pad_width), (0, 0)), mode='reflect')
+
+        def read_patch(y, x):
+            return pixels[y:y + patch_height, x:x + patch_width]
+    if image_channels != channels:
+        raise ValueError(f"Model expects {channels} channels, image has {image_channels}")
+
+    grid_height, grid_width = max(height, patch_height), max(width, patch_width)
+    window = _blend_window(patch_height, patch_width)
+    weighted = np.zeros((grid_height, grid_width), dtype=np.float32)
+    weights = np.zeros((grid_height, grid_width), dtype=np.float32)
+    positions = [
+        (y, x)
+        for y in _tile_starts(grid_height, patch_height, patch_height - overlap)
+        for x in _tile_starts(grid_width, patch_width, patch_width - overlap)
+    ]
+
+    try:
+        for i in range(0, len(positions), batch_size):
+            chunk = positions[i:i + batch_size]
+            with metrics.span('read_patches'):
+                batch = np.stack([read_patch(y, x) for y, x in chunk])
+            with metrics.span('infer_patches'):
+                probabilities = predict_fn(batch)
+            for (y, x), probability in zip(chunk, probabilities):
+                weighted[y:y + patch_height, x:x + patch_width] += probability * window
+                weights[y:y + patch_height, x:x + patch_width] += window
+    finally:
+        if source is not None:
+            source.close()
+
+    return (weighted / weights)[:height, :width]
+
+
+def predict_landslide(image, threshold=RISK_THRESHOLD, **tile_kwargs):
+    """
+    Predict landslide risk for a capture written by get_satellite_image.
+
+    Returns a dict with the per-pixel 'probability' map and binary 'mask'
+    at the capture's full resolution, plus a scalar 'risk_score' (the
+    fraction of pixels above threshold). Extra keyword arguments are passed
+    to predict_tiled.
+    """
+    with metrics.request('predict_tiled'):
+        probability = predict_tiled(image, **tile_kwargs)
+    mask = (probability >= threshold).astype(np.uint8)
+    return {
+        'probability': probability,
+        'mask': mask,
+        'risk_score': float(mask.mean()),
+    }
+
+
+def render_overlay(image, mask, out_path, color=(255, 0, 0), alpha=0.45):
+    """Blend a risk mask over its capture and save the result to out_path."""
+    from PIL import Image
+
+    base = Image.fromarray((load_image(image) * 255).astype(np.uint8))
+    tint = Image.new('RGB', base.size, color)
+    blend_mask = Image.fromarray((mask > 0).astype(np.uint8) * int(255 * alpha))
+    Image.composite(tint, base, blend_mask).save(out_path)
+    return out_path
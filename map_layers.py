@@ -0,0 +1,108 @@
+import glob
+import hashlib
+import json
+import os
+
+import numpy as np
+
+import capture_index
+import risk_heatmap
+from watchlist import list_sites
+
+# Point layers are written as static files and fetched by deck.gl in the
+# browser, so a rerun sends the map a URL rather than 100k serialized points.
+# Streamlit serves ./static at /app/static (see .streamlit/config.toml).
+POINTS_DIR = os.path.join("static", "points")
+POINTS_URL = os.environ.get('GEOSHIELD_POINTS_URL', "/app/static/points/{name}")
+# Half the side of a default 5 km capture, so footprints are drawn to scale
+FOOTPRINT_RADIUS_METERS = 2500
+# Risk colour ramp evaluated client-side per point: yellow at 0, red at 1
+RISK_COLOR = '[255, 255 * (1 - r), 0, 200]'
+
+
+def _write_points(prefix, version, lats, lons, labels, risks=None):
+    """
+    Write one version of a point layer as compact JSON records and remove
+    older versions. Returns the URL it is served at; an existing file for
+    this version is reused as is.
+    """
+    name = f"{prefix}-{hashlib.sha1(repr(version).encode('utf-8')).hexdigest()[:12]}.json"
+    path = os.path.join(POINTS_DIR, name)
+    if not os.path.exists(path):
+        os.makedirs(POINTS_DIR, exist_ok=True)
+        if risks is None:
+            records = (f'{{"x":{x:.5f},"y":{y:.5f},"d":{json.dumps(d)}}}'
+                       for x, y, d in zip(lons.tolist(), lats.tolist(), labels.tolist()))
+        else:
+            records = (f'{{"x":{x:.5f},"y":{y:.5f},"r":{r:.3f},"d":{json.dumps(d)}}}'
+                       for x, y, r, d in zip(lons.tolist(), lats.tolist(), risks.tolist(), labels.tolist()))
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write('[' + ','.join(records) + ']')
+        os.replace(tmp_path, path)
+    for stale in glob.glob(os.path.join(POINTS_DIR, f"{prefix}-*.json")):
+        if stale != path:
+            os.remove(stale)
+    return POINTS_URL.format(name=name)
+
+
+def capture_version():
+    """Token that changes whenever the capture archive does."""
+    return capture_index.version()
+
+
+def risk_version():
+    """Token that changes whenever a heatmap cell or watched site is rescored."""
+    checked = max((site['last_checked'] or 0 for site in list_sites()), default=0)
+    return risk_heatmap.cells_version() + (checked,)
+
+
+def export_capture_points():
+    """Export every indexed capture's centre and date. Returns (url, count)."""
+    lats, lons, captured_at = capture_index.point_arrays()
+    dates = captured_at.astype('datetime64[s]').astype('datetime64[D]').astype(str)
+    return _write_points('captures', capture_version(), lats, lons, dates), len(lats)
+
+
+def export_risk_points():
+    """
+    Export a risk point per scored heatmap cell and watched site, with its
+    landslide fraction. Returns (url, count).
+    """
+    lats, lons, risks = risk_heatmap.cell_points()
+    sites = [site for site in list_sites() if site['last_risk_score'] is not None]
+    if sites:
+        lats = np.concatenate([lats, [site['lat'] for site in sites]])
+        lons = np.concatenate([lons, [site['lon'] for site in sites]])
+        risks = np.concatenate([risks, [site['last_risk_score'] for site in sites]])
+    labels = np.char.add(np.round(risks * 100, 1).astype(str), '% landslide risk')
+    return _write_points('risk', risk_version(), lats, lons, labels, risks), len(lats)
+
+
+def build_archive_deck(captures_url=None, risk_url=None, center=(20, 0), zoom=2):
+    """
+    Build a pydeck Deck drawing capture footprints and risk points from their
+    exported URLs. Footprints keep a minimum pixel size so the whole archive
+    stays visible zoomed out.
+    """
+    import pydeck as pdk
+
+    layers = []
+    if captures_url:
+        layers.append(pdk.Layer(
+            'ScatterplotLayer', data=captures_url, id='captures',
+            get_position='[x, y]', get_radius=FOOTPRINT_RADIUS_METERS, radius_min_pixels=1,
+            get_fill_color=[0, 140, 255, 60], get_line_color=[0, 140, 255, 200],
+            stroked=True, line_width_min_pixels=1, pickable=True,
+        ))
+    if risk_url:
+        layers.append(pdk.Layer(
+            'ScatterplotLayer', data=risk_url, id='risk',
+            get_position='[x, y]', get_radius=FOOTPRINT_RADIUS_METERS / 2, radius_min_pixels=2,
+            get_fill_color=RISK_COLOR, pickable=True,
+        ))
+    return pdk.Deck(
+        layers=layers,
+        initial_view_state=pdk.ViewState(latitude=center[0], longitude=center[1], zoom=zoom),
+        tooltip={'text': '{d}'},
+    )
@@ -0,0 +1,216 @@
+import bisect
+import cProfile
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Port for the Prometheus endpoint; 0 leaves it off
+METRICS_PORT = int(os.environ.get('GEOSHIELD_METRICS_PORT', 0))
+METRICS_HOST = os.environ.get('GEOSHIELD_METRICS_HOST', '127.0.0.1')
+# Requests slower than this many seconds dump a cProfile; 0 disables profiling
+PROFILE_SLOW_SECONDS = float(os.environ.get('GEOSHIELD_PROFILE_SLOW_SECONDS', 0))
+PROFILE_DIR = os.path.join("satellite_images", "profiles")
+
+# Histogram bucket upper bounds in seconds, from cache hits up to full captures
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_help = {
+    'geoshield_stage_seconds': "Time spent in each stage of a capture, prediction or job.",
+    'geoshield_stage_errors_total': "Exceptions raised out of each stage, by exception type.",
+    'geoshield_request_seconds': "End-to-end time of each top-level request.",
+    'geoshield_image_cache_total': "Image cache lookups by result.",
+    'geoshield_prediction_cache_total': "Prediction cache lookups by result.",
+    'geoshield_capture_errors_total': "Failed captures by cause.",
+    'geoshield_download_bytes_total': "Bytes downloaded from the imagery backend.",
+    'geoshield_watchlist_sites_total': "Watchlist sites checked, by outcome.",
+    'geoshield_heatmap_cells_total': "Heatmap cells checked, by outcome.",
+    'geoshield_slow_requests_total': "Requests slower than the profiling threshold.",
+}
+_local = threading.local()
+# cProfile can only run one profiler per process at a time
+_profile_lock = threading.Lock()
+_server = None
+
+
+def set_profiling(slow_seconds):
+    """Profile requests and dump those slower than slow_seconds; 0 turns profiling off."""
+    global PROFILE_SLOW_SECONDS
+    PROFILE_SLOW_SECONDS = float(slow_seconds or 0)
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, amount=1, **labels):
+    """Add amount to a counter."""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(name, value, **labels):
+    """Record one value in a latency histogram."""
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {'buckets': [0] * (len(LATENCY_BUCKETS) + 1), 'sum': 0.0, 'count': 0}
+        histogram['buckets'][bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        histogram['sum'] += value
+        histogram['count'] += 1
+
+
+@contextmanager
+def span(stage):
+    """
+    Time a block as one stage. The duration goes into the
+    geoshield_stage_seconds histogram and, inside a request, into that
+    request's span list; exceptions are counted per stage and re-raised.
+    """
+    started = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        inc('geoshield_stage_errors_total', stage=stage, error=error)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        observe('geoshield_stage_seconds', elapsed, stage=stage)
+        spans = getattr(_local, 'spans', None)
+        if spans is not None:
+            spans.append({'stage': stage, 'start': started, 'seconds': elapsed, 'error': error})
+
+
+@contextmanager
+def request(name, **attributes):
+    """
+    Track a top-level request (a capture, a job, a CLI target) and collect the
+    spans recorded on this thread while it runs. Nested requests count as
+    plain spans. If profiling is on and the request takes longer than
+    PROFILE_SLOW_SECONDS, its cProfile stats and span timeline are written to
+    PROFILE_DIR.
+    """
+    if getattr(_local, 'spans', None) is not None:
+        with span(name):
+            yield
+        return
+
+    profiler = None
+    if PROFILE_SLOW_SECONDS > 0 and _profile_lock.acquire(blocking=False):
+        profiler = cProfile.Profile()
+        profiler.enable()
+    _local.spans = []
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        spans, _local.spans = _local.spans, None
+        if profiler is not None:
+            profiler.disable()
+            _profile_lock.release()
+        observe('geoshield_request_seconds', elapsed, request=name)
+        if PROFILE_SLOW_SECONDS > 0 and elapsed >= PROFILE_SLOW_SECONDS:
+            inc('geoshield_slow_requests_total', request=name)
+            _dump_profile(name, attributes, elapsed, started, spans, profiler)
+
+
+def _dump_profile(name, attributes, elapsed, started, spans, profiler):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, f"{name}_{time.strftime('%Y%m%d_%H%M%S')}_{threading.get_ident()}")
+    with open(base + '.json', 'w') as f:
+        json.dump({
+            'request': name,
+            'attributes': attributes,
+            'seconds': elapsed,
+            'spans': [{**s, 'start': s['start'] - started} for s in spans],
+        }, f, indent=2, default=str)
+    # Requests that overlapped another profiled request only get the span timeline
+    if profiler is not None:
+        profiler.dump_stats(base + '.prof')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def render_prometheus():
+    """Return all counters and histograms in the Prometheus text exposition format."""
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((key, dict(h, buckets=list(h['buckets']))) for key, h in _histograms.items())
+
+    lines = []
+    declared = set()
+
+    def declare(name, kind):
+        if name not in declared:
+            declared.add(name)
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), value in counters:
+        declare(name, 'counter')
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+    for (name, labels), histogram in histograms:
+        declare(name, 'histogram')
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), histogram['buckets']):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {histogram['sum']}")
+        lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    """Clear every counter and histogram."""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def start_metrics_server(port=METRICS_PORT, host=METRICS_HOST):
+    """
+    Serve /metrics in a daemon thread. Safe to call repeatedly; only the first
+    call starts a server. Returns the bound (host, port), or None if port is 0.
+    """
+    global _server
+    if not port:
+        return None
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = render_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    with _lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), MetricsHandler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name='metrics', daemon=True).start()
+        return _server.server_address[:2]
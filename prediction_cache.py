@@ -0,0 +1,111 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+
+import landslide_model
+import metrics
+from blob_store import content_sha256, file_sha256
+
+PREDICTION_CACHE_DIR = os.path.join("satellite_images", "predictions")
+
+_fingerprints = {}
+_fingerprint_lock = threading.Lock()
+
+
+def model_fingerprint(backend=None):
+    """
+    Identify the weights a backend serves. Derived from the model file's
+    contents, so replacing Kitretsu.h5 (or the exported ONNX file) yields a
+    new fingerprint and retires every prediction made with the old one.
+    """
+    backend = backend or landslide_model.BACKEND
+    path = landslide_model.ONNX_MODEL_PATH if backend == 'onnx' else landslide_model.MODEL_PATH
+    stat = os.stat(path)
+    # Only rehash when the file changes on disk
+    memo_key = (backend, os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _fingerprint_lock:
+        if memo_key not in _fingerprints:
+            _fingerprints[memo_key] = hashlib.sha256(
+                f"{backend}:{file_sha256(path)}".encode('utf-8')
+            ).hexdigest()[:16]
+        return _fingerprints[memo_key]
+
+
+def _entry_path(image_hash, fingerprint, params):
+    key = hashlib.sha256(
+        json.dumps({'image': image_hash, 'params': params}, sort_keys=True).encode('utf-8')
+    ).hexdigest()
+    return os.path.join(PREDICTION_CACHE_DIR, fingerprint, f"{key}.npz")
+
+
+def load_prediction(path):
+    """Read a cached prediction back into the predict_landslide result format."""
+    with np.load(path) as data:
+        shape = tuple(data['shape'])
+        mask = np.unpackbits(data['mask_bits'], count=shape[0] * shape[1]).reshape(shape)
+        return {
+            'probability': data['probability'].astype(np.float32) / 255.0,
+            'mask': mask,
+            'risk_score': float(data['risk_score']),
+        }
+
+
+def save_prediction(path, result):
+    """Store a prediction compactly: bit-packed mask, uint8 probabilities, zlib-compressed."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+    np.savez_compressed(
+        tmp_path,
+        shape=np.array(result['mask'].shape),
+        mask_bits=np.packbits(result['mask'].astype(np.uint8)),
+        probability=np.round(np.clip(result['probability'], 0, 1) * 255).astype(np.uint8),
+        risk_score=np.float64(result['risk_score']),
+    )
+    os.replace(tmp_path, path)
+
+
+def cached_predict_landslide(image_path, threshold=landslide_model.RISK_THRESHOLD,
+                             predict_fn=None, backend=None, **tile_kwargs):
+    """
+    predict_landslide with a persistent cache keyed by the capture's content
+    hash (see blob_store.content_sha256) and the fingerprint of the backend's model. Cached probabilities are
+    quantized to 1/255; masks are exact. predict_fn must serve backend.
+    """
+    backend = backend or landslide_model.BACKEND
+    with metrics.request('predict', image=image_path):
+        fingerprint = model_fingerprint(backend)
+        params = {'threshold': threshold, **tile_kwargs}
+        with metrics.span('hash_capture'):
+            path = _entry_path(content_sha256(image_path), fingerprint, params)
+        if os.path.exists(path):
+            metrics.inc('geoshield_prediction_cache_total', result='hit')
+            with metrics.span('load_prediction'):
+                return load_prediction(path)
+        metrics.inc('geoshield_prediction_cache_total', result='miss')
+
+        result = landslide_model.predict_landslide(image_path, threshold=threshold, predict_fn=predict_fn,
+                                                   backend=backend, **tile_kwargs)
+        with metrics.span('save_prediction'):
+            save_prediction(path, result)
+        return result
+
+
+def purge_stale(keep=None):
+    """Delete cached predictions made by any model other than the current ones."""
+    if keep is None:
+        keep = [
+            model_fingerprint(backend) for backend, path in (
+                ('keras', landslide_model.MODEL_PATH),
+                ('onnx', landslide_model.ONNX_MODEL_PATH),
+            ) if os.path.exists(path)
+        ]
+    keep = set(keep)
+    if not os.path.isdir(PREDICTION_CACHE_DIR):
+        return
+    for name in os.listdir(PREDICTION_CACHE_DIR):
+        if name not in keep:
+            shutil.rmtree(os.path.join(PREDICTION_CACHE_DIR, name), ignore_errors=True)
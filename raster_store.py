@@ -0,0 +1,147 @@
+import os
+
+import numpy as np
+
+from blob_store import content_sha256
+
+COG_DIR = os.path.join("satellite_images", "cog")
+COG_BLOCK_SIZE = 256
+# Overviews are added until the smallest level fits in one block
+OVERVIEW_RESAMPLING = 'average'
+THUMBNAIL_SIZE = 512
+# GeoTIFF tag recording the content hash of the PNG a COG was converted from
+SOURCE_TAG = 'GEOSHIELD_SOURCE_SHA256'
+
+
+def cog_path_for(png_path):
+    """Return where the Cloud-Optimized GeoTIFF for a PNG capture is stored."""
+    return os.path.join(COG_DIR, os.path.splitext(os.path.basename(png_path))[0] + '.tif')
+
+
+def write_cog(png_path, bounds, cog_path=None, sha256=None):
+    """
+    Convert a PNG capture into a georeferenced Cloud-Optimized GeoTIFF.
+
+    bounds is [west, south, east, north] in EPSG:4326 (as returned by
+    region_bounds). The output is tiled in COG_BLOCK_SIZE blocks, DEFLATE
+    compressed, and carries internal overviews so viewers and thumbnails can
+    read a reduced level instead of decoding the full image. The PNG's
+    content hash (sha256 if the caller has it) is stored in the SOURCE_TAG
+    tag so readers can tell which file the COG belongs to.
+    """
+    import rasterio
+    import rasterio.shutil
+    from PIL import Image
+    from rasterio.io import MemoryFile
+    from rasterio.transform import from_bounds
+
+    cog_path = cog_path or cog_path_for(png_path)
+    sha256 = sha256 or content_sha256(png_path)
+    os.makedirs(os.path.dirname(cog_path) or '.', exist_ok=True)
+    with Image.open(png_path) as img:
+        pixels = np.asarray(img.convert('RGB'))
+    height, width = pixels.shape[:2]
+
+    profile = {
+        'driver': 'GTiff',
+        'width': width,
+        'height': height,
+        'count': 3,
+        'dtype': 'uint8',
+        'crs': 'EPSG:4326',
+        'transform': from_bounds(*bounds, width, height),
+        'photometric': 'RGB',
+    }
+    tmp_path = f"{cog_path}.{os.getpid()}.tmp"
+    with MemoryFile() as memfile:
+        with memfile.open(**profile) as dataset:
+            dataset.write(pixels.transpose(2, 0, 1))
+            dataset.update_tags(**{SOURCE_TAG: sha256})
+        with memfile.open() as dataset:
+            rasterio.shutil.copy(
+                dataset, tmp_path, driver='COG',
+                blocksize=COG_BLOCK_SIZE, compress='DEFLATE',
+                overview_resampling=OVERVIEW_RESAMPLING,
+            )
+    os.replace(tmp_path, cog_path)
+    return cog_path
+
+
+def cog_for(png_path, sha256=None):
+    """
+    Return the COG converted from exactly this PNG, or None. Sidecars are
+    named after the PNG's basename only, so the source hash tag is checked.
+    """
+    cog_path = cog_path_for(png_path)
+    if not os.path.exists(cog_path):
+        return None
+    import rasterio
+
+    with rasterio.open(cog_path) as dataset:
+        source = dataset.tags().get(SOURCE_TAG)
+    return cog_path if source == (sha256 or content_sha256(png_path)) else None
+
+
+def ensure_cog(png_path, bounds, sha256=None):
+    """Return the COG for a PNG capture, converting it on first use or if it belongs to another file."""
+    sha256 = sha256 or content_sha256(png_path)
+    return cog_for(png_path, sha256) or write_cog(png_path, bounds, cog_path_for(png_path), sha256)
+
+
+def raster_bounds(cog_path):
+    """Return [west, south, east, north] of a GeoTIFF."""
+    import rasterio
+
+    with rasterio.open(cog_path) as dataset:
+        return list(dataset.bounds)
+
+
+def read_window(cog_path, x, y, width, height):
+    """
+    Read a pixel window as an HxWx3 uint8 array. Only the blocks overlapping
+    the window are decoded; areas outside the raster are zero-filled.
+    """
+    with WindowedImage(cog_path) as image:
+        return image.read(x, y, width, height)
+
+
+def read_thumbnail(cog_path, max_size=THUMBNAIL_SIZE):
+    """
+    Read the whole raster downsampled to fit max_size. GDAL serves this from
+    the closest internal overview rather than the full-resolution data.
+    """
+    import rasterio
+
+    with rasterio.open(cog_path) as dataset:
+        scale = min(max_size / dataset.width, max_size / dataset.height, 1.0)
+        out_shape = (dataset.count, max(int(dataset.height * scale), 1), max(int(dataset.width * scale), 1))
+        data = dataset.read(out_shape=out_shape)
+    return data.transpose(1, 2, 0)
+
+
+class WindowedImage:
+    """
+    Open a GeoTIFF for patch-wise reads, so tiled inference can pull one
+    patch at a time instead of decoding the full capture.
+    """
+
+    def __init__(self, cog_path):
+        import rasterio
+
+        self._dataset = rasterio.open(cog_path)
+        self.shape = (self._dataset.height, self._dataset.width, self._dataset.count)
+
+    def read(self, x, y, width, height):
+        from rasterio.windows import Window
+
+        data = self._dataset.read(window=Window(x, y, width, height), boundless=True, fill_value=0)
+        return data.transpose(1, 2, 0)
+
+    def close(self):
+        self._dataset.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
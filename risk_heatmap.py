@@ -0,0 +1,318 @@
+import math
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+import metrics
+from capture import get_satellite_image
+from capture_engine import MAX_WORKERS, capture_many
+from grid_scan import KM_PER_DEG_LAT, make_grid
+from imagery_backend import get_imagery_backend
+
+HEATMAP_DIR = os.path.join("satellite_images", "heatmap")
+HEATMAP_DB = os.path.join(HEATMAP_DIR, "heatmap.sqlite")
+# Streamlit serves ./static at /app/static when server.enableStaticServing is on
+TILE_DIR = os.path.join("static", "heatmap")
+TILE_URL = os.environ.get('GEOSHIELD_HEATMAP_TILE_URL', "/app/static/heatmap/{region}/{z}/{x}/{y}.png")
+TILE_SIZE = 256
+MIN_ZOOM = 6
+MAX_ZOOM = 12
+# Each grid cell's risk mask is averaged down to CELL_PX x CELL_PX values
+CELL_PX = 8
+# Cells whose landslide fraction is below this are drawn transparent
+MIN_VISIBLE_RISK = 0.02
+
+REGION_NAME = re.compile(r"^[A-Za-z0-9_-]+$")
+
+_db_lock = threading.Lock()
+_update_lock = threading.Lock()
+
+
+def _connect():
+    os.makedirs(HEATMAP_DIR, exist_ok=True)
+    conn = sqlite3.connect(HEATMAP_DB, timeout=30)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS regions (
+            name TEXT PRIMARY KEY,
+            south REAL NOT NULL,
+            west REAL NOT NULL,
+            north REAL NOT NULL,
+            east REAL NOT NULL,
+            tile_km REAL NOT NULL,
+            updated REAL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS cells (
+            region TEXT NOT NULL,
+            row INTEGER NOT NULL,
+            col INTEGER NOT NULL,
+            scene_id TEXT,
+            scene_time INTEGER,
+            risk_score REAL,
+            updated REAL,
+            PRIMARY KEY (region, row, col)
+        )
+    """)
+    return conn
+
+
+def _execute(sql, args=()):
+    with _db_lock:
+        conn = _connect()
+        try:
+            rows = conn.execute(sql, args).fetchall()
+            conn.commit()
+            return rows
+        finally:
+            conn.close()
+
+
+def _grid_path(name):
+    return os.path.join(HEATMAP_DIR, f"{name}.npy")
+
+
+def define_region(name, south, west, north, east, tile_km=5):
+    """
+    Add or redefine a heatmap region. Redefining discards its cells and tiles,
+    so the next update_region rebuilds it from scratch.
+    """
+    if not REGION_NAME.match(name):
+        raise ValueError("Region names may only contain letters, digits, '-' and '_'")
+    make_grid(south, west, north, east, tile_km)  # Validates the box and the tile count
+    delete_region(name)
+    _execute("INSERT INTO regions (name, south, west, north, east, tile_km) VALUES (?, ?, ?, ?, ?, ?)",
+             (name, south, west, north, east, tile_km))
+
+
+def delete_region(name):
+    """Remove a region with its cells, grid and rendered tiles."""
+    _execute("DELETE FROM regions WHERE name = ?", (name,))
+    _execute("DELETE FROM cells WHERE region = ?", (name,))
+    if os.path.exists(_grid_path(name)):
+        os.remove(_grid_path(name))
+    shutil.rmtree(os.path.join(TILE_DIR, name), ignore_errors=True)
+
+
+def list_regions():
+    """Return every heatmap region, ordered by name; updated is when its tiles last changed."""
+    columns = ('name', 'south', 'west', 'north', 'east', 'tile_km', 'updated')
+    rows = _execute(f"SELECT {', '.join(columns)} FROM regions ORDER BY name")
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def _open_grid(name, tiles):
+    shape = (max(t['row'] for t in tiles) + 1, max(t['col'] for t in tiles) + 1, CELL_PX, CELL_PX)
+    path = _grid_path(name)
+    if os.path.exists(path):
+        grid = np.load(path, mmap_mode='r+')
+        if grid.shape == shape:
+            return grid
+        del grid
+    grid = np.lib.format.open_memmap(path, mode='w+', dtype=np.float16, shape=shape)
+    grid[:] = np.nan
+    return grid
+
+
+def _block_means(mask, size=CELL_PX):
+    # Fraction of landslide pixels in each of size x size blocks, north at the top
+    mask = np.asarray(mask, dtype=np.float32)
+    ys = np.linspace(0, mask.shape[0], size + 1).astype(int)
+    xs = np.linspace(0, mask.shape[1], size + 1).astype(int)
+    sums = np.add.reduceat(np.add.reduceat(mask, ys[:-1], axis=0), xs[:-1], axis=1)
+    return sums / np.outer(np.diff(ys), np.diff(xs))
+
+
+def update_region(name, predict_fn=None, max_workers=MAX_WORKERS, on_progress=None, backend=None):
+    """
+    Bring a region's heatmap up to date.
+
+    Every cell is checked for a newer scene in one batched
+    resolve_latest_scenes call; only cells with one are captured and scored,
+    and only the map tiles overlapping those cells are re-rendered. Returns a
+    summary with the number of cells, the cells updated and failed, and the
+    number of tiles written. backend selects the inference backend;
+    predict_fn must serve the same one.
+    """
+    regions = {region['name']: region for region in list_regions()}
+    if name not in regions:
+        raise ValueError(f"Unknown heatmap region {name!r}")
+    region = regions[name]
+    tiles = make_grid(region['south'], region['west'], region['north'], region['east'], region['tile_km'])
+
+    with _update_lock:
+        known = {
+            (row, col): scene_time
+            for row, col, scene_time in _execute("SELECT row, col, scene_time FROM cells WHERE region = ?", (name,))
+        }
+        grid = _open_grid(name, tiles)
+        with metrics.span('heatmap_resolve'):
+            scenes = get_imagery_backend().resolve_latest_scenes([
+                (tile['bounds'], known.get((tile['row'], tile['col']))) for tile in tiles
+            ])
+        changed = [(tile, scene) for tile, scene in zip(tiles, scenes) if scene is not None]
+        scenes_by_point = {(tile['lat'], tile['lon']): scene for tile, scene in changed}
+
+        def capture_fn(lat, lon):
+            return get_satellite_image(lat, lon, region['tile_km'], scene=scenes_by_point[(lat, lon)])
+
+        captures = capture_many([(tile['lat'], tile['lon']) for tile, _ in changed], capture_fn,
+                                max_workers=max_workers, on_progress=on_progress)
+
+        from prediction_cache import cached_predict_landslide
+
+        updated, failed = [], []
+        for (tile, scene), captured in zip(changed, captures):
+            error = captured['error']
+            if not error:
+                try:
+                    prediction = cached_predict_landslide(captured['filename'], predict_fn=predict_fn,
+                                                          backend=backend)
+                except Exception as e:
+                    error = f"Prediction failed: {e}"
+            if error:
+                failed.append({'row': tile['row'], 'col': tile['col'], 'error': error})
+                continue
+            grid[tile['row'], tile['col']] = _block_means(prediction['mask'])
+            _execute("INSERT OR REPLACE INTO cells (region, row, col, scene_id, scene_time, risk_score, updated) "
+                     "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                     (name, tile['row'], tile['col'], scene['scene_id'], scene['time'],
+                      prediction['risk_score'], time.time()))
+            updated.append(tile)
+        grid.flush()
+
+        with metrics.span('heatmap_render'):
+            written = render_tiles(region, grid, [tile['bounds'] for tile in updated])
+        if written:
+            _execute("UPDATE regions SET updated = ? WHERE name = ?", (time.time(), name))
+        del grid
+    metrics.inc('geoshield_heatmap_cells_total', len(tiles) - len(changed), status='unchanged')
+    metrics.inc('geoshield_heatmap_cells_total', len(updated), status='updated')
+    metrics.inc('geoshield_heatmap_cells_total', len(failed), status='failed')
+    return {'region': name, 'cells': len(tiles), 'updated': len(updated), 'failed': failed, 'tiles': written}
+
+
+def cell_points():
+    """
+    Return (lat, lon, risk_score) NumPy arrays with the centre of every scored
+    cell across all regions, computed from the grid layout rather than stored.
+    """
+    lats, lons, scores = [], [], []
+    regions = {region['name']: region for region in list_regions()}
+    rows = _execute("SELECT region, row, col, risk_score FROM cells WHERE risk_score IS NOT NULL")
+    for name in {row[0] for row in rows}:
+        region = regions.get(name)
+        if region is None:
+            continue
+        cells = np.array([row[1:] for row in rows if row[0] == name], dtype=np.float64)
+        dlat = region['tile_km'] / KM_PER_DEG_LAT
+        lat = region['south'] + (cells[:, 0] + 0.5) * dlat
+        dlon = region['tile_km'] / (KM_PER_DEG_LAT * np.maximum(np.cos(np.radians(lat)), 0.01))
+        lats.append(lat)
+        lons.append(region['west'] + (cells[:, 1] + 0.5) * dlon)
+        scores.append(cells[:, 2])
+    if not lats:
+        return np.zeros(0), np.zeros(0), np.zeros(0)
+    return np.concatenate(lats), np.concatenate(lons), np.concatenate(scores)
+
+
+def cells_version():
+    """Token that changes whenever any cell is rescored, for cache keys."""
+    return tuple(_execute("SELECT COUNT(*), COALESCE(MAX(updated), 0) FROM cells")[0])
+
+
+def _tile_range(bounds, zoom):
+    # XYZ tiles (Web Mercator) covering [west, south, east, north]
+    west, south, east, north = bounds
+    n = 2 ** zoom
+
+    def tile_x(lon):
+        return min(max(int((lon + 180) / 360 * n), 0), n - 1)
+
+    def tile_y(lat):
+        lat = math.radians(max(min(lat, 85.0511), -85.0511))
+        return min(max(int((1 - math.asinh(math.tan(lat)) / math.pi) / 2 * n), 0), n - 1)
+
+    return range(tile_x(west), tile_x(east) + 1), range(tile_y(north), tile_y(south) + 1)
+
+
+def _sample_tile(region, grid, zoom, x, y):
+    # Risk value under every pixel of one XYZ tile, NaN outside the region
+    n = 2 ** zoom
+    offsets = (np.arange(TILE_SIZE) + 0.5) / TILE_SIZE
+    lons = (x + offsets) / n * 360 - 180
+    lats = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + offsets) / n))))
+
+    n_rows, n_cols = grid.shape[:2]
+    dlat = region['tile_km'] / KM_PER_DEG_LAT
+    row_pos = (lats - region['south']) / dlat
+    rows = np.floor(row_pos).astype(int)
+    row_ok = (rows >= 0) & (rows < n_rows)
+    rows = np.clip(rows, 0, n_rows - 1)
+    # Like make_grid, each row uses the longitude spacing of its centre latitude
+    centre_lats = region['south'] + (rows + 0.5) * dlat
+    dlon = region['tile_km'] / (KM_PER_DEG_LAT * np.maximum(np.cos(np.radians(centre_lats)), 0.01))
+    row_cols = np.ceil((region['east'] - region['west']) / dlon).astype(int)
+    col_pos = (lons[None, :] - region['west']) / dlon[:, None]
+    cols = np.floor(col_pos).astype(int)
+    valid = row_ok[:, None] & (cols >= 0) & (cols < row_cols[:, None])
+    cols = np.clip(cols, 0, n_cols - 1)
+
+    block_y = np.clip(((1 - (row_pos - np.floor(row_pos))) * CELL_PX).astype(int), 0, CELL_PX - 1)
+    block_x = np.clip(((col_pos - np.floor(col_pos)) * CELL_PX).astype(int), 0, CELL_PX - 1)
+    values = np.asarray(grid[rows[:, None], cols, block_y[:, None], block_x], dtype=np.float32)
+    values[~valid] = np.nan
+    return values
+
+
+def _colorize(values):
+    # Transparent where unknown or negligible, then yellow to red with rising opacity
+    strength = np.clip(np.nan_to_num(values, nan=0.0) * 2, 0, 1)
+    rgba = np.zeros(values.shape + (4,), dtype=np.uint8)
+    rgba[..., 0] = 255
+    rgba[..., 1] = (255 * (1 - strength)).astype(np.uint8)
+    visible = ~np.isnan(values) & (values >= MIN_VISIBLE_RISK)
+    rgba[..., 3] = np.where(visible, 90 + 140 * strength, 0).astype(np.uint8)
+    return rgba
+
+
+def render_tiles(region, grid, changed_bounds=None):
+    """
+    Render the XYZ tiles from MIN_ZOOM to MAX_ZOOM that overlap changed_bounds
+    (every tile of the region if None) into TILE_DIR/<region>/z/x/y.png.
+    Fully transparent tiles are removed rather than written. Returns the
+    number of tiles rendered.
+    """
+    from PIL import Image
+
+    if changed_bounds is None:
+        changed_bounds = [[region['west'], region['south'], region['east'], region['north']]]
+    rendered = 0
+    for zoom in range(MIN_ZOOM, MAX_ZOOM + 1):
+        targets = set()
+        for bounds in changed_bounds:
+            xs, ys = _tile_range(bounds, zoom)
+            targets.update((x, y) for x in xs for y in ys)
+        for x, y in sorted(targets):
+            path = os.path.join(TILE_DIR, region['name'], str(zoom), str(x), f"{y}.png")
+            rgba = _colorize(_sample_tile(region, grid, zoom, x, y))
+            if not rgba[..., 3].any():
+                if os.path.exists(path):
+                    os.remove(path)
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp.png"
+            Image.fromarray(rgba, 'RGBA').save(tmp_path, optimize=True)
+            os.replace(tmp_path, path)
+            rendered += 1
+    return rendered
+
+
+def tile_url(region):
+    """Leaflet URL template for a region's tiles; versioned so browsers refetch after updates."""
+    return TILE_URL.format(region=region['name'], z='{z}', x='{x}', y='{y}') + f"?v={int(region['updated'] or 0)}"
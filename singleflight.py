@@ -0,0 +1,40 @@
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key: the first caller runs the
+    function and every caller that arrives while it is in flight waits for
+    and receives the same result (or exception). Nothing is cached once the
+    call completes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) unless a call for key is already running; return its result."""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+
+        if not leader:
+            return future.result()
+
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._calls[key]
+        return future.result()
+
+    def in_flight(self):
+        """Return the number of distinct keys currently being fetched."""
+        with self._lock:
+            return len(self._calls)
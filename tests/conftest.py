@@ -0,0 +1,39 @@
+"""
+Shared fixtures for the test suite. Tests run in a scratch directory and
+never touch the real archive or Earth Engine:
+
+    pytest tests/
+"""
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import blob_store  # noqa: E402
+import capture  # noqa: E402
+import capture_index  # noqa: E402
+import image_cache  # noqa: E402
+import raster_store  # noqa: E402
+
+SAMPLE_DIR = os.path.join(REPO_ROOT, 'satellite_images')
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    """Point the capture archive, object store, image cache and index at a scratch directory."""
+    captures = tmp_path / 'satellite_images'
+    monkeypatch.setattr(capture, 'CAPTURE_DIR', str(captures))
+    monkeypatch.setattr(capture, 'BAND_CAPTURE_DIR', str(captures / 'bands'))
+    monkeypatch.setattr(blob_store, 'OBJECT_DIR', str(captures / 'objects'))
+    monkeypatch.setattr(image_cache, 'CACHE_DIR', str(captures / 'cache'))
+    monkeypatch.setattr(image_cache, 'CACHE_DB', str(captures / 'cache' / 'index.sqlite'))
+    monkeypatch.setattr(raster_store, 'COG_DIR', str(captures / 'cog'))
+    monkeypatch.setattr(capture_index, 'INDEX_DB', str(captures / 'index.sqlite'))
+    monkeypatch.setattr(capture_index, '_conn', None)
+    monkeypatch.chdir(tmp_path)
+    yield captures
+    if capture_index._conn is not None:
+        capture_index._conn.close()
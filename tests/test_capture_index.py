@@ -0,0 +1,23 @@
+from datetime import datetime, timedelta
+
+import capture_index
+
+
+def test_query_bbox_is_exact_despite_float32_rtree(workspace):
+    taken = datetime(2024, 10, 27, 1, 2, 37)
+    capture_index.add_capture('edge.png', 30.123457, 79.0, taken)
+    capture_index.add_capture('later.png', 30.0, 79.0, taken + timedelta(seconds=40))
+
+    def paths(**kwargs):
+        return sorted(row['path'] for row in capture_index.query_bbox(**kwargs))
+
+    # A capture taken exactly at start, or on the box edge, is inside
+    assert paths(south=30.123457, west=78.0, north=31.0, east=80.0) == ['edge.png']
+    assert paths(south=29.0, west=78.0, north=31.0, east=80.0,
+                 start=taken, end=taken + timedelta(hours=1)) == ['edge.png', 'later.png']
+    assert paths(south=29.0, west=78.0, north=31.0, east=80.0,
+                 start=taken - timedelta(seconds=30), end=taken + timedelta(seconds=30)) == ['edge.png']
+    # Captures just outside the window stay out, even within float32 rounding
+    assert paths(south=29.0, west=78.0, north=31.0, east=80.0,
+                 start=taken + timedelta(seconds=1), end=taken + timedelta(seconds=30)) == []
+    assert paths(south=30.123458, west=78.0, north=31.0, east=80.0) == []
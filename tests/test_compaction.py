@@ -0,0 +1,121 @@
+import glob
+import os
+import shutil
+import time
+from datetime import datetime
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import blob_store
+import capture_index
+import compaction
+import image_cache
+import raster_store
+from conftest import SAMPLE_DIR
+
+SAMPLES = sorted(glob.glob(os.path.join(SAMPLE_DIR, 'sat_*.png')))
+
+
+@pytest.fixture
+def archive(workspace, monkeypatch):
+    monkeypatch.setattr(compaction, 'CAPTURE_DIR', str(workspace))
+    monkeypatch.setattr(compaction, 'BAND_CAPTURE_DIR', str(workspace / 'bands'))
+    workspace.mkdir(parents=True, exist_ok=True)
+
+    def add(sample, captured_at, lat=30.0, lon=79.0):
+        path = os.path.join(workspace, f"sat_{lat:.4f}_{lon:.4f}_{captured_at:%Y%m%d_%H%M%S}.png")
+        shutil.copyfile(sample, path)
+        capture_index.add_capture(path, lat, lon, captured_at)
+        return path
+    return add
+
+
+def _pixels(path):
+    with Image.open(path) as img:
+        return np.asarray(img.convert('RGB'))
+
+
+def test_dedupe_links_identical_captures_to_one_object(archive):
+    first = archive(SAMPLES[0], datetime(2024, 1, 1))
+    second = archive(SAMPLES[0], datetime(2024, 1, 2))
+    other = archive(SAMPLES[1], datetime(2024, 1, 3))
+
+    summary = compaction.compact(recompress=False)
+
+    assert os.path.samefile(first, second)
+    assert not os.path.samefile(first, other)
+    assert summary['dedupe_bytes_saved'] == os.path.getsize(SAMPLES[0])
+    assert blob_store.usage()[0] == 2
+
+
+def test_recompress_round_trip_keeps_pixels_and_content_hash(archive):
+    path = archive(SAMPLES[0], datetime(2024, 1, 1))
+    original_sha256 = blob_store.file_sha256(path)
+    cached = image_cache.store('key', 'scene', path, sha256=original_sha256)
+
+    summary = compaction.compact()
+
+    assert summary['recompressed'] == 1
+    assert os.path.getsize(path) < os.path.getsize(SAMPLES[0])
+    assert np.array_equal(_pixels(path), _pixels(SAMPLES[0]))
+    assert blob_store.content_sha256(path) == original_sha256
+    conn = image_cache._connect()
+    size, sha256 = conn.execute("SELECT size, sha256 FROM entries WHERE path = ?", (cached,)).fetchone()
+    conn.close()
+    assert (size, sha256) == (os.path.getsize(path), blob_store.file_sha256(path))
+
+    # A later capture of the same PNG bytes dedupes onto the WebP object
+    again = archive(SAMPLES[0], datetime(2024, 2, 1))
+    obj = blob_store.store(again, original_sha256)
+    assert obj.endswith('.webp') and os.path.samefile(again, path)
+
+
+def test_age_retention_deletes_old_captures_and_index_rows(archive):
+    old = archive(SAMPLES[0], datetime(2020, 1, 1))
+    recent = archive(SAMPLES[1], datetime.now())
+
+    summary = compaction.compact(recompress=False, max_age_days=365)
+
+    assert summary['captures_deleted'] == 1
+    assert not os.path.exists(old) and os.path.exists(recent)
+    assert [row['path'] for row in capture_index.query_bbox(-90, -180, 90, 180)] == [recent]
+    assert blob_store.usage()[0] == 1
+
+
+def test_quota_ignores_bytes_only_the_cache_can_free(archive):
+    old = archive(SAMPLES[1], datetime.fromtimestamp(time.time() - 7200))
+    recent = archive(SAMPLES[2], datetime.fromtimestamp(time.time() - 3600))
+    # A cache-only file larger than the whole quota
+    os.makedirs(image_cache.CACHE_DIR, exist_ok=True)
+    shutil.copyfile(SAMPLES[0], os.path.join(image_cache.CACHE_DIR, 'entry.png'))
+    assert os.path.getsize(SAMPLES[0]) > os.path.getsize(recent) + 1
+
+    compaction.compact(recompress=False, max_bytes=os.path.getsize(recent) + 1)
+
+    assert not os.path.exists(old)
+    assert os.path.exists(recent)
+
+
+def test_quota_counts_cog_sidecars_and_removes_orphans(archive):
+    old = archive(SAMPLES[1], datetime.fromtimestamp(time.time() - 7200))
+    recent = archive(SAMPLES[2], datetime.fromtimestamp(time.time() - 3600))
+    os.makedirs(raster_store.COG_DIR, exist_ok=True)
+    sidecar = raster_store.cog_path_for(recent)
+    with open(sidecar, 'wb') as f:
+        f.write(b'\0' * 1024)
+    orphan = os.path.join(raster_store.COG_DIR, 'sat_10.0000_10.0000_20200101_000000.tif')
+    shutil.copyfile(sidecar, orphan)
+
+    pngs = os.path.getsize(old) + os.path.getsize(recent)
+
+    # Both PNGs fit, but not with the recent capture's sidecar
+    summary = compaction.compact(recompress=False, max_bytes=pngs + 512)
+
+    assert summary['bytes_before'] == pngs + 1024
+    assert not os.path.exists(old)
+    assert os.path.exists(recent) and os.path.exists(sidecar)
+    assert not os.path.exists(orphan)
+    assert summary['sidecars_removed'] == 1
+    assert summary['bytes_after'] == os.path.getsize(recent) + 1024
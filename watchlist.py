@@ -0,0 +1,163 @@
+import os
+import sqlite3
+import threading
+import time
+
+import metrics
+from capture import get_satellite_image
+from capture_engine import MAX_WORKERS, capture_many
+from grid_scan import region_bounds
+from imagery_backend import get_imagery_backend
+
+WATCHLIST_DB = os.path.join("satellite_images", "watchlist.sqlite")
+
+NEW = 'new'
+UNCHANGED = 'unchanged'
+FAILED = 'failed'
+
+_COLUMNS = ('name', 'lat', 'lon', 'size_km', 'added', 'last_checked', 'last_scene_id',
+            'last_scene_time', 'last_image_date', 'last_filename', 'last_risk_score', 'last_error')
+
+_db_lock = threading.Lock()
+
+
+def _connect():
+    os.makedirs(os.path.dirname(WATCHLIST_DB), exist_ok=True)
+    conn = sqlite3.connect(WATCHLIST_DB, timeout=30)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sites (
+            name TEXT PRIMARY KEY,
+            lat REAL NOT NULL,
+            lon REAL NOT NULL,
+            size_km REAL NOT NULL,
+            added REAL NOT NULL,
+            last_checked REAL,
+            last_scene_id TEXT,
+            last_scene_time INTEGER,
+            last_image_date TEXT,
+            last_filename TEXT,
+            last_risk_score REAL,
+            last_error TEXT
+        )
+    """)
+    return conn
+
+
+def _execute(sql, args=()):
+    with _db_lock:
+        conn = _connect()
+        try:
+            rows = conn.execute(sql, args).fetchall()
+            conn.commit()
+            return rows
+        finally:
+            conn.close()
+
+
+def add_site(name, lat, lon, size_km=5):
+    """Add a site to the watchlist, or move an existing site (which resets its history)."""
+    if not -90 <= lat <= 90 or not -180 <= lon <= 180:
+        raise ValueError(f"Invalid coordinates for site {name!r}: {lat}, {lon}")
+    _execute("INSERT OR REPLACE INTO sites (name, lat, lon, size_km, added) VALUES (?, ?, ?, ?, ?)",
+             (name, lat, lon, size_km, time.time()))
+
+
+def remove_site(name):
+    """Drop a site from the watchlist; returns whether it existed."""
+    existed = bool(_execute("SELECT 1 FROM sites WHERE name = ?", (name,)))
+    _execute("DELETE FROM sites WHERE name = ?", (name,))
+    return existed
+
+
+def list_sites():
+    """Return every watched site with its last processed scene, ordered by name."""
+    rows = _execute(f"SELECT {', '.join(_COLUMNS)} FROM sites ORDER BY name")
+    return [dict(zip(_COLUMNS, row)) for row in rows]
+
+
+def _record(site, scene, filename, risk_score, checked):
+    _execute("""
+        UPDATE sites SET last_checked = ?, last_scene_id = ?, last_scene_time = ?, last_image_date = ?,
+                         last_filename = ?, last_risk_score = ?, last_error = NULL
+        WHERE name = ?
+    """, (checked, scene['scene_id'], scene['time'], scene['date'], filename, risk_score, site['name']))
+
+
+def _record_error(site, error, checked):
+    # The scene isn't marked processed, so the next refresh retries it
+    _execute("UPDATE sites SET last_checked = ?, last_error = ? WHERE name = ?", (checked, error, site['name']))
+
+
+def refresh(predict=True, names=None, max_workers=MAX_WORKERS, predict_fn=None, on_progress=None,
+            backend=None):
+    """
+    Check every watched site (or just names) for scenes acquired after the
+    last one processed, and capture and score only the sites that have one.
+
+    All sites are resolved together with resolve_latest_scenes, which the
+    Earth Engine backend answers in one round trip per RESOLVE_BATCH_SIZE
+    sites, so an unchanged watchlist costs a single query. Returns one dict
+    per site with its status (NEW, UNCHANGED or FAILED), scene and score;
+    on_progress(done, total, result) is called as each new scene is processed.
+    backend selects the inference backend; predict_fn must serve the same one.
+    """
+    sites = list_sites()
+    if names is not None:
+        names = set(names)
+        sites = [site for site in sites if site['name'] in names]
+    checked = time.time()
+    with metrics.span('watchlist_resolve'):
+        scenes = get_imagery_backend().resolve_latest_scenes([
+            (region_bounds(site['lat'], site['lon'], site['size_km']), site['last_scene_time'])
+            for site in sites
+        ])
+
+    results = []
+    changed = []
+    for site, scene in zip(sites, scenes):
+        if scene is None:
+            results.append({'name': site['name'], 'status': UNCHANGED, 'scene_id': site['last_scene_id'],
+                            'image_date': site['last_image_date'], 'filename': site['last_filename'],
+                            'risk_score': site['last_risk_score'], 'error': None})
+        else:
+            changed.append((site, scene))
+    if results:
+        unchanged = [result['name'] for result in results]
+        _execute(f"UPDATE sites SET last_checked = ? WHERE name IN ({', '.join('?' * len(unchanged))})",
+                 (checked, *unchanged))
+    metrics.inc('geoshield_watchlist_sites_total', len(results), status=UNCHANGED)
+
+    done = 0
+    # capture_many takes (lat, lon); group the changed sites by tile size
+    for size_km in sorted({site['size_km'] for site, _ in changed}):
+        group = [(site, scene) for site, scene in changed if site['size_km'] == size_km]
+        scenes_by_point = {(site['lat'], site['lon']): scene for site, scene in group}
+
+        def capture_fn(lat, lon, size_km=size_km, scenes_by_point=scenes_by_point):
+            return get_satellite_image(lat, lon, size_km, scene=scenes_by_point[(lat, lon)])
+
+        captures = capture_many([(site['lat'], site['lon']) for site, _ in group], capture_fn,
+                                max_workers=max_workers)
+        for (site, scene), captured in zip(group, captures):
+            result = {'name': site['name'], 'status': NEW, 'scene_id': scene['scene_id'],
+                      'image_date': scene['date'], 'filename': captured['filename'],
+                      'risk_score': None, 'error': captured['error']}
+            if captured['filename'] and predict:
+                try:
+                    from prediction_cache import cached_predict_landslide
+
+                    result['risk_score'] = cached_predict_landslide(captured['filename'], predict_fn=predict_fn,
+                                                                    backend=backend)['risk_score']
+                except Exception as e:
+                    result['error'] = f"Prediction failed: {e}"
+            if result['error']:
+                result['status'] = FAILED
+                _record_error(site, result['error'], checked)
+            else:
+                _record(site, scene, result['filename'], result['risk_score'], checked)
+            metrics.inc('geoshield_watchlist_sites_total', status=result['status'])
+            results.append(result)
+            done += 1
+            if on_progress:
+                on_progress(done, len(changed), result)
+    return sorted(results, key=lambda result: result['name'])